@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def stretch_limits(rgb, percent=1, step=8):
+    # limits from a subsample of the pixels in view.
+    sample = rgb[::step, ::step]
+    low, high = np.percentile(sample, (percent, 100 - percent))
+    if high <= low:
+        return 0, 255
+    return low, high
+
+
+def make_lut(brightness=0, contrast=1.0, gamma=1.0, low=0, high=255):
+    values = np.arange(256, dtype=np.float64)
+    values = (values - low) * (255 / (high - low))
+    values = (values - 128) * contrast + 128 + brightness
+    np.clip(values, 0, 255, out=values)
+    values = 255 * (values / 255) ** (1 / gamma)
+    return np.round(values).astype(np.uint8)
+
+
+def apply_lut(lut, rgb):
+    return np.take(lut, rgb)
@@ -1,17 +1,65 @@
+import time
+startup_time = time.perf_counter()
 import argparse
 import csv
+import importlib
 import os
 from collections import namedtuple
-from math import sqrt, pi, atan2
+from math import sqrt, pi, log2, inf
 import platform
-import cairo
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import gi
-import numpy as np
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, Gdk, Gio, GdkPixbuf, GObject
-
-
-def cl_arg():
+from gi.repository import Gtk, Gdk, Gio, GdkPixbuf, GObject, GLib
+import annotations
+from buffer_manager import BufferManager
+import image_info
+import point_types
+import sidecars
+
+
+class LazyModule:
+    # the module is imported the first time it is used.
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attr):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attr)
+
+
+np = LazyModule('numpy')
+cairo = LazyModule('cairo')
+segmentation = LazyModule('segmentation')
+exporters = LazyModule('exporters')
+merge_markings = LazyModule('merge_markings')
+multiprocessing = LazyModule('multiprocessing')
+thumbnails = LazyModule('thumbnails')
+input_trace = LazyModule('input_trace')
+validate = LazyModule('validate')
+adjustments = LazyModule('adjustments')
+image_backends = LazyModule('image_backends')
+resample = LazyModule('resample')
+startup_phases = [('imports', time.perf_counter())]
+
+
+def startup_phase(name):
+    startup_phases.append((name, time.perf_counter()))
+
+
+def report_startup():
+    last = startup_time
+    for name, phase_time in startup_phases:
+        print('%-12s %7.1f ms' % (name, (phase_time - last) * 1000))
+        last = phase_time
+    print('%-12s %7.1f ms' % ('total', (last - startup_time) * 1000))
+
+
+def cl_arg(argv=None):
     parser = argparse.ArgumentParser(
         formatter_class=argparse.MetavarTypeHelpFormatter,
         description='GUI to annotate images.')
@@ -24,32 +72,76 @@ def cl_arg():
     parser.add_argument('-p', '--points',
                         type=str,
                         help='File of saved points in csv (%(type)s).')
-    arguments = parser.parse_args()
+    parser.add_argument('-s', '--sidecars',
+                        type=str,
+                        help='Folder with per image marking files '
+                             '(%(type)s).')
+    parser.add_argument('-g', '--segmenter',
+                        type=str,
+                        help='Segmenter used when no computer annotated '
+                             'image exists, a registered name or '
+                             'module:function (%(type)s).')
+    parser.add_argument('--timings',
+                        action='store_true',
+                        help='Print the time of each startup phase.')
+    parser.add_argument('--record',
+                        type=str,
+                        help='File to record the input events to '
+                             '(%(type)s).')
+    parser.add_argument('--replay',
+                        type=str,
+                        help='File of recorded input events to replay and '
+                             'report the latency of (%(type)s).')
+    parser.add_argument('files',
+                        type=str,
+                        nargs='*',
+                        help='Images, folders, point type or point files '
+                             'to open (%(type)s).')
+    arguments = parser.parse_args(argv)
     return arguments
 
 
-def main(handler):
-    args = cl_arg()
+def main(handler, args, cwd=None):
+    def path(filename):
+        if cwd is None:
+            return filename
+        return os.path.join(cwd, filename)
+    if args.segmenter:
+        handler.segmenter = args.segmenter
+    if args.sidecars:
+        handler.open_sidecar_project(path(args.sidecars))
     if args.images:
-        if os.path.isdir(args.images):
-            handler.open_image_folder(args.images)
+        if os.path.isdir(path(args.images)):
+            handler.open_image_folder(path(args.images))
         else:
-            handler.open_image(args.images)
+            handler.open_image(path(args.images))
     if args.types:
-        handler.load_point_types(args.types)
+        handler.load_point_types(path(args.types))
     if args.points:
-        handler.load_points(args.points)
+        if not handler.warning_dialog_response():
+            handler.load_points(path(args.points))
+    for filename in args.files:
+        handler.open_file(path(filename))
 
 
 class App(Gtk.Application):
     def __init__(self):
+        # later launches are forwarded to the running instance.
+        flags = Gio.ApplicationFlags.HANDLES_OPEN | \
+            Gio.ApplicationFlags.HANDLES_COMMAND_LINE
         super().__init__(application_id='org.annotate.images',
-                         flags=Gio.ApplicationFlags.FLAGS_NONE)
+                         flags=flags)
         self.window = None
         self.handler = None
+        self.report_timings = False
+        self.record_file = None
+        self.replay_file = None
+        self.recorder = None
+        self.replayer = None
 
     def do_startup(self):
         Gtk.Application.do_startup(self)
+        startup_phase('startup')
         self.make_action('preferences', self.on_preferences)
         self.make_action('open_image_folder', self.on_open_image_folder)
         self.make_action('open_image', self.on_open_image)
@@ -57,36 +149,97 @@ class App(Gtk.Application):
         self.make_action('open_markings_types', self.on_open_marking_types)
         self.make_action('save_markings', self.on_save_markings)
         self.make_action('save_as_markings', self.on_save_as_markings)
+        self.make_action('open_sidecar_project', self.on_open_sidecar_project)
+        self.make_action('merge_markings', self.on_merge_markings)
         self.make_action('quit', self.on_quit)
         self.make_action('previous_image', self.on_previous_image)
         self.make_action('next_image', self.on_next_image)
         self.make_action('switch_image', self.on_switch_image)
         self.make_action('switch_to_boundingbox', self.on_switch_bounding_box)
+        self.make_action('switch_to_select', self.on_switch_select)
+        self.make_action('delete_selection', self.on_delete_selection)
+        self.make_action('retype_selection', self.on_retype_selection)
+        self.make_action('find_point_type', self.on_find_point_type)
+        self.make_action('suggest_markings', self.on_suggest_markings)
+        self.make_action('show_filmstrip', self.on_show_filmstrip)
+        self.make_action('adjust_display', self.on_adjust_display)
+        self.make_action('export_coco', self.on_export_coco)
+        self.make_action('export_yolo', self.on_export_yolo)
+        self.make_action('export_voc', self.on_export_voc)
+        self.make_action('validate_markings', self.on_validate_markings)
+        self.make_action('accept_suggestions', self.on_accept_suggestions)
+        self.make_action('reject_suggestions', self.on_reject_suggestions)
         self.make_action('zoom_out', self.on_zoom_out)
         self.make_action('zoom_in', self.on_zoom_in)
         self.make_action('zoom_normal', self.on_zoom_normal)
         self.make_action('about', self.on_about)
 
     def do_activate(self):
+        if self.window is not None:
+            self.window.present()
+            return
         menu_builder = Gtk.Builder()
         menu_builder.add_from_file('data/menu.glade')
         menu_bar = menu_builder.get_object('menu_bar')
         self.set_menubar(menu_bar)
+        startup_phase('menu')
         win_builder = Gtk.Builder()
         win_builder.add_from_file('data/GUI.glade')
         self.handler = Handler(win_builder)
+        if self.record_file is not None:
+            self.recorder = input_trace.Recorder(self.handler,
+                                                 self.record_file)
         win_builder.connect_signals(self.handler)
         self.window = win_builder.get_object('main_window')
         self.window.set_title('Image Annotating')
         self.window.set_application(self)
+        startup_phase('window')
+        self.window.connect('draw', self.on_first_draw)
         self.window.show_all()
-        main(self.handler)
+
+    def on_first_draw(self, widget, cr):
+        self.window.disconnect_by_func(self.on_first_draw)
+        startup_phase('first draw')
+        # the idle tasks are only started when the window is on screen.
+        self.handler.start_idle_tasks()
+        if self.report_timings:
+            report_startup()
+        if self.replay_file is not None:
+            self.replayer = input_trace.Replayer(self, self.handler,
+                                                 self.replay_file)
+            self.replayer.start()
+        return False
+
+    def do_command_line(self, command_line):
+        # the launching process already parsed the arguments, this only
+        # keeps a bad forwarded command line from stopping the primary.
+        try:
+            args = cl_arg(command_line.get_arguments()[1:])
+        except SystemExit as error:
+            return error.code or 0
+        self.report_timings = self.report_timings or args.timings
+        if self.window is None:
+            self.record_file = args.record
+            self.replay_file = args.replay
+        self.activate()
+        main(self.handler, args, command_line.get_cwd())
+        return 0
+
+    def do_open(self, files, n_files, hint):
+        self.activate()
+        for file in files:
+            self.handler.open_file(file.get_path())
 
     def make_action(self, name, func):
         action = Gio.SimpleAction.new(name, None)
+        action.connect('activate', self.record_action, name)
         action.connect('activate', func)
         self.add_action(action)
 
+    def record_action(self, action, param, name):
+        if self.recorder is not None:
+            self.recorder.record_action(name)
+
     def on_about(self, action, param):
         about_dialog = AboutDialog(self.window)
         response = about_dialog.run()
@@ -108,6 +261,12 @@ class App(Gtk.Application):
     def on_open_marking_types(self, action, param):
         self.handler.file_dialog(self.handler.load_point_type_button)
 
+    def on_open_sidecar_project(self, action, param):
+        self.handler.sidecar_project_dialog()
+
+    def on_merge_markings(self, action, param):
+        self.handler.merge_dialog()
+
     def on_save_markings(self, action, param):
         self.handler.save_points_shortcut()
 
@@ -126,6 +285,52 @@ class App(Gtk.Application):
     def on_switch_bounding_box(self, action, param):
         self.handler.switch_things_shortcut(self.handler.switch_box_button)
 
+    def on_switch_select(self, action, param):
+        self.handler.switch_things_shortcut(self.handler.select_button)
+
+    def on_delete_selection(self, action, param):
+        self.handler.delete_selection()
+
+    def on_retype_selection(self, action, param):
+        self.handler.retype_selection()
+
+    def on_find_point_type(self, action, param):
+        PointTypeSearchDialog(self.window, self.handler.type_registry,
+                              self.handler.select_point_type)
+
+    def on_show_filmstrip(self, action, param):
+        self.handler.toggle_filmstrip()
+
+    def on_adjust_display(self, action, param):
+        display_adjustments = dict(self.handler.display_adjustments,
+                                   overlay=self.handler.overlay_opacity * 100)
+        adjust_dialog = AdjustDisplayDialog(
+            self.window, display_adjustments,
+            self.handler.set_display_adjustments)
+        adjust_dialog.connect('response', adjust_dialog.on_response)
+        adjust_dialog.show()
+
+    def on_export_coco(self, action, param):
+        self.handler.export_dialog('coco')
+
+    def on_export_yolo(self, action, param):
+        self.handler.export_dialog('yolo')
+
+    def on_export_voc(self, action, param):
+        self.handler.export_dialog('voc')
+
+    def on_validate_markings(self, action, param):
+        self.handler.validate_markings()
+
+    def on_suggest_markings(self, action, param):
+        self.handler.suggest_markings()
+
+    def on_accept_suggestions(self, action, param):
+        self.handler.accept_suggestions()
+
+    def on_reject_suggestions(self, action, param):
+        self.handler.reject_suggestions()
+
     def on_zoom_out(self, action, param):
         self.handler.zoom_pressed(self.handler.zoom_out_button)
 
@@ -136,27 +341,193 @@ class App(Gtk.Application):
         self.handler.zoom_pressed(self.handler.zoom_normal)
 
     def on_preferences(self, action, pram):
-        preferences_dialog = PreferencesDialog(self.window)
+        preferences = self.handler.get_preferences()
+        preferences_dialog = PreferencesDialog(self.window, preferences)
         response = preferences_dialog.run()
+        if response == Gtk.ResponseType.OK:
+            self.handler.set_preferences(preferences_dialog.get_preferences())
         if response:
             preferences_dialog.destroy()
 
 
 class PreferencesDialog(Gtk.Dialog):
-    def __init__(self, parent):
+    # name, label, lower, upper and step of each preference.
+    rows = [('memory_limit', 'Image memory limit (MB)', 64, 65536, 64),
+            ('merge_tolerance', 'Merge tolerance (px)', 1, 1000, 1),
+            ('lod_zoom', 'Overview below zoom (%)', 0, 250, 5),
+            ('lod_cell_size', 'Overview cell size (px)', 8, 512, 8),
+            ('suggest_min_area', 'Suggestion min. area (px)', 1, 100000, 10),
+            ('windowed_mp', 'Windowed reading above (MP)', 1, 100000, 10)]
+
+    def __init__(self, parent, preferences):
         header = 'Preferences'
-        response = (Gtk.STOCK_OK, Gtk.ResponseType.OK)
+        response = (Gtk.STOCK_CANCEL,
+                    Gtk.ResponseType.CANCEL,
+                    Gtk.STOCK_OK,
+                    Gtk.ResponseType.OK)
         Gtk.Dialog.__init__(self, header, parent, 0, response)
         self.set_default_size(150, 100)
-        label = Gtk.Label('Coming soon')
-        label2 = Gtk.Label('')
+        self.spin_buttons = {}
+        grid = Gtk.Grid(column_spacing=10, row_spacing=6, margin=10)
+        for idx, (name, text, lower, upper, step) in enumerate(self.rows):
+            label = Gtk.Label(text, halign=Gtk.Align.START)
+            adjustment = Gtk.Adjustment(preferences.get(name, lower),
+                                        lower, upper, step, step * 10)
+            spin_button = Gtk.SpinButton(adjustment=adjustment)
+            grid.attach(label, 0, idx, 1, 1)
+            grid.attach(spin_button, 1, idx, 1, 1)
+            self.spin_buttons[name] = spin_button
         box = self.get_content_area()
-        box.add(label)
-        box.add(label2)
+        box.add(grid)
+        self.show_all()
+
+    def get_preferences(self):
+        preferences = {}
+        for name, spin_button in self.spin_buttons.items():
+            preferences[name] = spin_button.get_value_as_int()
+        return preferences
+
+
+class AdjustDisplayDialog(Gtk.Dialog):
+    # name, label, lower, upper, step and neutral value of each slider.
+    rows = [('brightness', 'Brightness', -128, 128, 1, 0),
+            ('contrast', 'Contrast', 0.1, 4, 0.05, 1.0),
+            ('gamma', 'Gamma', 0.2, 5, 0.05, 1.0),
+            ('overlay', 'Segmented overlay (%)', 0, 100, 1, 0)]
+    defaults = {'brightness': 0, 'contrast': 1.0, 'gamma': 1.0,
+                'stretch': False}
+
+    def __init__(self, parent, adjustments, changed):
+        header = 'Display adjustments'
+        response = ('Reset', Gtk.ResponseType.REJECT,
+                    Gtk.STOCK_CLOSE, Gtk.ResponseType.CLOSE)
+        Gtk.Dialog.__init__(self, header, parent, 0, response)
+        self.set_default_size(300, 100)
+        self.changed = changed
+        self.scales = {}
+        grid = Gtk.Grid(column_spacing=10, row_spacing=6, margin=10)
+        for idx, (name, text, lower, upper, step, _) in enumerate(self.rows):
+            label = Gtk.Label(text, halign=Gtk.Align.START)
+            adjustment = Gtk.Adjustment(adjustments[name], lower, upper,
+                                        step, step * 10)
+            scale = Gtk.Scale(adjustment=adjustment, hexpand=True,
+                              digits=0 if step >= 1 else 2)
+            scale.connect('value-changed', self.on_changed)
+            grid.attach(label, 0, idx, 1, 1)
+            grid.attach(scale, 1, idx, 1, 1)
+            self.scales[name] = scale
+        self.stretch_button = Gtk.CheckButton(label='Stretch histogram',
+                                              active=adjustments['stretch'])
+        self.stretch_button.connect('toggled', self.on_changed)
+        grid.attach(self.stretch_button, 0, len(self.rows), 2, 1)
+        box = self.get_content_area()
+        box.add(grid)
         self.show_all()
-        # drawing size
-        # ending of annotated files
-        # working dir
+
+    def get_adjustments(self):
+        adjustments = {'stretch': self.stretch_button.get_active()}
+        for name, scale in self.scales.items():
+            adjustments[name] = scale.get_value()
+        return adjustments
+
+    def on_changed(self, *args):
+        self.changed(self.get_adjustments())
+
+    def on_response(self, dialog, response):
+        if response == Gtk.ResponseType.REJECT:
+            for name, *_, neutral in self.rows:
+                self.scales[name].set_value(neutral)
+            self.stretch_button.set_active(False)
+        else:
+            self.destroy()
+
+
+class PointTypeSearchDialog(Gtk.Dialog):
+    def __init__(self, parent, type_registry, select):
+        header = 'Find point type'
+        response = (Gtk.STOCK_CLOSE, Gtk.ResponseType.CLOSE)
+        Gtk.Dialog.__init__(self, header, parent, 0, response)
+        self.set_default_size(300, 400)
+        self.type_registry = type_registry
+        self.select = select
+        self.entry = Gtk.SearchEntry(margin=10)
+        self.entry.connect('search-changed', self.on_search_changed)
+        self.entry.connect('activate', self.on_activate)
+        self.type_list = Gtk.ListStore(str, str, str)
+        tree = Gtk.TreeView(model=self.type_list, headers_visible=False)
+        color_column = Gtk.TreeViewColumn('', Gtk.CellRendererText(),
+                                          background=0)
+        color_column.set_fixed_width(20)
+        tree.append_column(color_column)
+        for idx in (1, 2):
+            tree.append_column(Gtk.TreeViewColumn('', Gtk.CellRendererText(),
+                                                  text=idx))
+        tree.connect('row-activated', self.on_row_activated)
+        scroll_window = Gtk.ScrolledWindow(vexpand=True)
+        scroll_window.add(tree)
+        box = self.get_content_area()
+        box.pack_start(self.entry, False, False, 0)
+        box.pack_start(scroll_window, True, True, 0)
+        self.connect('response', lambda dialog, response: dialog.destroy())
+        self.fill_list('')
+        self.show_all()
+        self.entry.grab_focus()
+
+    def fill_list(self, text):
+        self.type_list.clear()
+        for pt in self.type_registry.search(text):
+            self.type_list.append([pt.color, pt.name, pt.shortcut])
+
+    def on_search_changed(self, entry):
+        self.fill_list(entry.get_text())
+
+    def on_activate(self, entry):
+        if len(self.type_list):
+            self.choose(self.type_list[0][1])
+
+    def on_row_activated(self, tree, path, column):
+        self.choose(self.type_list[path][1])
+
+    def choose(self, name):
+        self.select(name)
+        self.destroy()
+
+
+class ValidationDialog(Gtk.Dialog):
+    def __init__(self, parent, issues, counts, open_image):
+        header = 'Validation of the markings'
+        response = (Gtk.STOCK_CLOSE, Gtk.ResponseType.CLOSE)
+        Gtk.Dialog.__init__(self, header, parent, 0, response)
+        self.set_default_size(600, 400)
+        self.open_image = open_image
+        text = '%i issues found' % len(issues)
+        for issue, count in sorted(counts.items()):
+            text = text + '\n%s: %i' % (issue, count)
+        label = Gtk.Label(text, halign=Gtk.Align.START, margin=10)
+        self.issue_list = Gtk.ListStore(str, str, str, str)
+        for entry in issues:
+            image, issue, point_type = entry[:3]
+            self.issue_list.append([image, issue, point_type,
+                                    validate.position_text(entry)])
+        tree = Gtk.TreeView(model=self.issue_list)
+        for idx, title in enumerate(('Image', 'Issue', 'Type', 'Position')):
+            column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(),
+                                        text=idx)
+            column.set_sort_column_id(idx)
+            tree.append_column(column)
+        tree.connect('row-activated', self.on_row_activated)
+        scroll_window = Gtk.ScrolledWindow(vexpand=True)
+        scroll_window.add(tree)
+        box = self.get_content_area()
+        box.pack_start(label, False, False, 0)
+        box.pack_start(scroll_window, True, True, 0)
+        self.connect('response', lambda dialog, response: dialog.destroy())
+        self.show_all()
+
+    def on_row_activated(self, tree, path, column):
+        image = self.issue_list[path][0]
+        if os.path.isfile(image):
+            self.open_image(image)
 
 
 class AboutDialog(Gtk.Dialog):
@@ -209,6 +580,117 @@ class OverridePointImageDialog(Gtk.Dialog):
         self.show_all()
 
 
+class Filmstrip:
+    def __init__(self, open_image, size=128, margin=5):
+        self.open_image = open_image
+        self.margin = margin
+        # thumbnail, label and image of each row.
+        self.store = Gtk.ListStore(GdkPixbuf.Pixbuf, str, str)
+        self.icon_view = Gtk.IconView(model=self.store)
+        self.icon_view.set_pixbuf_column(0)
+        self.icon_view.set_markup_column(1)
+        self.icon_view.set_item_width(size)
+        self.icon_view.set_activate_on_single_click(True)
+        self.icon_view.connect('item-activated', self.on_item_activated)
+        self.icon_view.connect('size-allocate', self.on_visible_changed)
+        self.scroll_window = Gtk.ScrolledWindow()
+        self.scroll_window.set_policy(Gtk.PolicyType.AUTOMATIC,
+                                      Gtk.PolicyType.NEVER)
+        self.scroll_window.set_min_content_height(size + 60)
+        self.scroll_window.add(self.icon_view)
+        h_adjust = self.scroll_window.get_hadjustment()
+        h_adjust.connect('value-changed', self.on_visible_changed)
+        self.executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        self.images = []
+        self.rows = {}
+        self.requested = set()
+        self.materialised = set()
+        self.counts = {}
+
+    def set_images(self, images):
+        if images == self.images:
+            return
+        self.images = images
+        self.rows = {image: idx for idx, image in enumerate(images)}
+        self.requested = set()
+        self.materialised = set()
+        self.store.clear()
+        for image in images:
+            self.store.append([None, self.make_label(image), image])
+        self.icon_view.set_columns(max(len(images), 1))
+        GLib.idle_add(self.update_visible)
+
+    def make_label(self, image):
+        name = GLib.markup_escape_text(os.path.basename(image))
+        return '<small>%s</small>\n<b>%i</b>' % (name,
+                                                  self.counts.get(image, 0))
+
+    def set_counts(self, counts):
+        changed = {image for image in set(counts) | set(self.counts)
+                   if counts.get(image, 0) != self.counts.get(image, 0)}
+        self.counts = counts
+        for image in changed:
+            idx = self.rows.get(image)
+            if idx is not None:
+                self.store[idx][1] = self.make_label(image)
+
+    def set_count(self, image, count):
+        if self.counts.get(image, 0) == count:
+            return
+        self.counts[image] = count
+        idx = self.rows.get(image)
+        if idx is not None:
+            self.store[idx][1] = self.make_label(image)
+
+    def select(self, image):
+        idx = self.rows.get(image)
+        if idx is not None:
+            path = Gtk.TreePath.new_from_indices([idx])
+            self.icon_view.select_path(path)
+            self.icon_view.scroll_to_path(path, False, 0, 0)
+
+    def on_item_activated(self, icon_view, path):
+        self.open_image(self.store[path][2])
+
+    def on_visible_changed(self, *args):
+        GLib.idle_add(self.update_visible)
+
+    def update_visible(self):
+        # only the thumbnails in view are kept in memory.
+        visible = self.icon_view.get_visible_range()
+        if visible is None:
+            return False
+        start = max(visible[0].get_indices()[0] - self.margin, 0)
+        end = min(visible[1].get_indices()[0] + self.margin,
+                  len(self.images) - 1)
+        for idx in list(self.materialised):
+            if not start <= idx <= end:
+                self.store[idx][0] = None
+                self.materialised.discard(idx)
+                self.requested.discard(self.images[idx])
+        for idx in range(start, end + 1):
+            image = self.images[idx]
+            if image not in self.requested:
+                self.requested.add(image)
+                self.executor.submit(self.make_thumbnail, image)
+        return False
+
+    def make_thumbnail(self, image):
+        # runs in a worker thread, the result is handed to the main loop.
+        try:
+            buf = thumbnails.load_thumbnail(image)
+        except OSError:
+            buf = None
+        GLib.idle_add(self.set_thumbnail, image, buf)
+
+    def set_thumbnail(self, image, buf):
+        idx = self.rows.get(image)
+        if idx is not None and image in self.requested and buf is not None:
+            self.store[idx][0] = buf
+            self.materialised.add(idx)
+        return False
+
+
 class Handler:
     def __init__(self, gui_builder):
         self.dir_delimiter = '/'
@@ -216,14 +698,13 @@ class Handler:
             self.dir_delimiter = '\\'
         # named tuples used.
         self.buf_and_image = namedtuple('buf_and_image', ['buf', 'image'])
-        self.color = namedtuple('color', ['r', 'g', 'b', 'a'])
-        self.point = namedtuple('point', ('image', 'type',
-                                          'x', 'y', 'x2', 'y2', 'box')
-                                + self.color._fields)
-        self.summary_values = namedtuple('summary_values', ['amount', 'size',
-                                                            'color'])
+        self.color = annotations.color
+        self.point = annotations.point
+        self.summary_values = annotations.summary_values
         # handles to different widgets
         self.main_window = gui_builder.get_object('main_window')
+        self.vertical_box = gui_builder.get_object('vertical_box')
+        self.filmstrip = None
         self.scroll_window = gui_builder.get_object('scroll_window')
         self.v_adjust = self.scroll_window.get_vadjustment()
         self.h_adjust = self.scroll_window.get_hadjustment()
@@ -249,6 +730,7 @@ class Handler:
         self.switch_image_button = gui_builder.get_object('switch_image')
         self.switch_image_button.set_sensitive(False)
         self.switch_box_button = gui_builder.get_object('draw_boxes')
+        self.select_button = gui_builder.get_object('select_markings')
         self.progress_bar = gui_builder.get_object('progress_bar')
         self.last_entry_label = gui_builder.get_object('last_entry')
         self.next_image_button = gui_builder.get_object('open_next_image')
@@ -260,11 +742,13 @@ class Handler:
         self.status_bar = gui_builder.get_object('status_bar')
         self.status_msg = self.status_bar.get_context_id('Message')
         self.status_warning = self.status_bar.get_context_id('Warning')
+        self.status_memory = self.status_bar.get_context_id('Memory')
         self.show_missing_image_warning = True
         # ready the draw area
         self.scroll_speed = 78
         self.radius = 10
         self.buffers_and_images = {}
+        self.buffer_manager = BufferManager()
         self.init_draw_area(gui_builder)
         self.window_height = 0
         self.window_width = 0
@@ -274,27 +758,70 @@ class Handler:
         self.pressed_on_point_head = False
         self.pressed_on_point_tail = False
         self.point_clicked = None
+        self.point_clicked_id = None
+        self.drag_id = None
+        self.drag_start = None
         self.pressed_x = None
         self.pressed_y = None
         self.draw_temp = None
         self.draw_buf_temp = None
         self.do_draw_bounding_boxes = False
+        # ready the selection of markings
+        self.do_select = False
+        self.do_select_drag = False
+        self.move_selection = False
+        self.selection = {}
+        self.selection_offset = (0, 0)
+        self.lasso = []
+        # ready the overview drawing at low zoom
+        self.lod_zoom = 30
+        self.lod_cell_size = 32
+        self.marking_arrays = {}
+        # ready the segmentation of images without an annotated image
+        self.segmenter = 'excess_green'
+        self.segmenting = set()
+        self.suggestions = {}
+        self.suggest_min_area = 20
+        # ready the display adjustments of the original image
+        self.display_adjustments = dict(AdjustDisplayDialog.defaults)
+        self.adjusted_tile = None
+        self.overlay_opacity = 0
+        self.overlay_tile = None
+        # ready the windowed reading of very large images
+        self.windowed_mp = 100
+        self.image_backend = None
+        self.viewport_key = None
+        self.viewport_rgb = None
+        self.viewport_executor = ThreadPoolExecutor(max_workers=1)
+        # ready the scaling of the layers on all cores
+        self.resampler = None
         # ready the point type selection
         self.point_type_color = self.hex_color_to_rgba('#FF0000')
         self.point_type = None
+        self.type_registry = point_types.PointTypes()
+        self.shortcut_keys = ''
+        self.shortcut_timer = None
+        self.shortcut_timeout = 700
         self.current_image = 'None'
         self.list_of_images = []
         self.tree_image_index = {}
+        self.folder_images = {}
         self.image_folder = None
         self.current_point_file = None
+        self.sidecar_project = None
+        self.loaded_sidecars = set()
+        self.dirty_images = set()
+        self.merge_tolerance = 10
         self.font = 'arial 11'
         self.bold_font = 'arial bold 11'
         self.background_color = '#FFFFFF'
         self.point_summary_dict = {}
         self.point_type_button.set_active(0)
-        # init list to store points in
-        self.point_list = []
+        # init store to keep the markings in
+        self.store = annotations.AnnotationStore()
         self.points_saved = True
+        self.edit_count = 0
+        self.saving = False
         self.override_point_image_match = False
         # init variables for zooming
         self.slider_pressed = False
@@ -302,6 +829,8 @@ class Handler:
         self.image_width = 100
         self.image_height = 100
         self.do_run_idle_tasks = True
+
+    def start_idle_tasks(self):
         task = self.do_draw_markings_when_idle()
         GObject.idle_add(task.__next__)
         task2 = self.do_move_draw_image_if_scrolled()
@@ -326,7 +855,8 @@ class Handler:
     def do_draw_markings_when_idle(self):
         while self.do_run_idle_tasks:
             if not self.do_drag and not self.do_scroll and \
-                    not self.slider_pressed:
+                    not self.slider_pressed and not self.do_select_drag \
+                    and self.drag_id is None:
                 self.draw_markings()
             yield True
         yield False
@@ -377,21 +907,17 @@ class Handler:
         rgba = self.color._make(rgb)
         return rgba
 
-    @staticmethod
-    def rgba_color_to_hex(rgba):
-        rgb = (int(rgba.r * 255), int(rgba.g * 255), int(rgba.b * 255))
-        hex_color = '#%02X%02X%02X' % rgb
-        return hex_color
-
     def switch_images(self, button):
         original = self.buffers_and_images.get('original')
         bw = self.buffers_and_images.get('bw')
         if button.get_active():
             original.image.hide()
             bw.image.show()
+            self.zoom()
         else:
             original.image.show()
             bw.image.hide()
+            self.draw_markings()
 
     def switch_to_bounding_box(self, button):
         if button.get_active():
@@ -401,6 +927,16 @@ class Handler:
             self.do_draw_bounding_boxes = False
             self.set_cursor()
 
+    def switch_to_select(self, button):
+        if button.get_active():
+            self.do_select = True
+            self.set_cursor('cross')
+        else:
+            self.do_select = False
+            self.selection = {}
+            self.set_cursor()
+        self.draw_markings()
+
     def zoom_slide(self, slider, scroll, value):
         self.zoom_percent = round(value)
         if abs(slider.get_value() - value) >= 10:
@@ -489,26 +1025,187 @@ class Handler:
         yield True
         width, height = self.scale_to_zoom(self.image_width, self.image_height)
         self.layout.set_size(width, height)
-        for bi in self.buffers_and_images.values():
+        pinned = [(self.current_image, name, None)
+                  for name in self.buffers_and_images]
+        layers = self.buffers_and_images.items()
+        if self.image_backend is not None:
+            layers = ()
+            self.render_viewport()
+        for name, bi in layers:
+            key = (self.current_image, name, self.zoom_percent)
+            # the scaled bw layer is only made when it is switched to.
+            if name == 'bw' and bi.buf is not None and \
+                    not self.switch_image_button.get_active():
+                bi.image.clear()
+                continue
             try:
-                self.scale_image(bi, height, width)
+                self.scale_image_cached(key, bi, height, width)
+                pinned.append(key)
             except AttributeError:
                 self.warn_annotated_image()
             progress = progress + 0.50
             self.progress_bar.set_fraction(progress)
             yield True
+        pinned.append('draw')
+        self.buffer_manager.set_pinned(pinned)
         self.draw_markings()
+        self.report_memory_usage()
         self.progress_bar.set_text('Done!')
         yield False
 
-    @staticmethod
-    def scale_image(buf_image, height, width):
-        buf_new = buf_image.buf.scale_simple(width,
-                                             height,
-                                             GdkPixbuf.InterpType.BILINEAR)
+    def scale_image_cached(self, key, buf_image, height, width):
+        buf_new = self.buffer_manager.get(key)
+        if buf_new is None:
+            buf_new = self.scale_image(buf_image, height, width)
+            self.buffer_manager.add(key, buf_new, BufferManager.SCALED)
+        else:
+            buf_image.image.set_from_pixbuf(buf_new)
+        return buf_new
+
+    def scale_image(self, buf_image, height, width):
+        if self.resampler is None:
+            self.resampler = resample.Resampler()
+        buf_new = self.resampler.scale(buf_image.buf, width, height)
         buf_image.image.set_from_pixbuf(buf_new)
         return buf_new
 
+    def set_display_adjustments(self, display_adjustments):
+        self.overlay_opacity = display_adjustments.pop('overlay') / 100
+        if display_adjustments != self.display_adjustments:
+            self.display_adjustments = display_adjustments
+            self.adjusted_tile = None
+        self.draw_markings()
+
+    def get_overlay_tile(self, width, height):
+        bw_buf = self.buffers_and_images.get('bw').buf
+        if bw_buf is None:
+            return None
+        x = self.h_adjust.get_value()
+        y = self.v_adjust.get_value()
+        key = (self.current_image, self.zoom_percent, x, y, width, height)
+        if self.overlay_tile is not None and self.overlay_tile[0] == key:
+            return self.overlay_tile[1]
+        # only the visible part of the bw layer is scaled.
+        factor = self.zoom_percent / 100
+        left = min(max(int(x / factor), 0), bw_buf.get_width())
+        top = min(max(int(y / factor), 0), bw_buf.get_height())
+        right = min(int((x + width) / factor) + 2, bw_buf.get_width())
+        bottom = min(int((y + height) / factor) + 2, bw_buf.get_height())
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        if right > left and bottom > top:
+            tile = bw_buf.new_subpixbuf(left, top, right - left, bottom - top)
+            cr = cairo.Context(surface)
+            cr.translate(left * factor - x, top * factor - y)
+            cr.scale(factor, factor)
+            Gdk.cairo_set_source_pixbuf(cr, tile, 0, 0)
+            cr.paint()
+        self.overlay_tile = (key, surface)
+        return surface
+
+    def get_adjusted_tile(self, width, height):
+        x = int(self.h_adjust.get_value())
+        y = int(self.v_adjust.get_value())
+        layer = 'original'
+        if self.switch_image_button.get_active():
+            layer = 'bw'
+        settings = tuple(sorted(self.display_adjustments.items()))
+        key = (self.current_image, layer, self.zoom_percent, x, y, width,
+               height, settings)
+        if self.adjusted_tile is not None and self.adjusted_tile[0] == key:
+            return self.adjusted_tile[1]
+        rgb = self.get_visible_pixels(layer, x, y, width, height)
+        if rgb is None:
+            return None
+        low, high = 0, 255
+        if self.display_adjustments['stretch']:
+            low, high = adjustments.stretch_limits(rgb)
+        lut = adjustments.make_lut(self.display_adjustments['brightness'],
+                                   self.display_adjustments['contrast'],
+                                   self.display_adjustments['gamma'],
+                                   low, high)
+        adjusted = adjustments.apply_lut(lut, rgb)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        if adjusted.size:
+            tile_height, tile_width = adjusted.shape[:2]
+            tile = GdkPixbuf.Pixbuf.new_from_bytes(
+                GLib.Bytes.new(adjusted.tobytes()), GdkPixbuf.Colorspace.RGB,
+                False, 8, tile_width, tile_height, tile_width * 3)
+            cr = cairo.Context(surface)
+            Gdk.cairo_set_source_pixbuf(cr, tile, 0, 0)
+            cr.paint()
+        self.adjusted_tile = (key, surface)
+        return surface
+
+    def get_visible_pixels(self, layer, x, y, width, height):
+        # only the pixels in view are copied out of the shown layer.
+        if self.image_backend is not None:
+            if self.viewport_rgb is None:
+                return None
+            key, rgb = self.viewport_rgb
+            if key[:4] != (self.current_image, self.zoom_percent, x, y):
+                return None
+            return rgb[:height, :width]
+        buf = self.buffer_manager.get((self.current_image, layer,
+                                       self.zoom_percent))
+        if buf is None:
+            return None
+        width = min(width, buf.get_width() - x)
+        height = min(height, buf.get_height() - y)
+        if width <= 0 or height <= 0:
+            return None
+        window = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB,
+                                      buf.get_has_alpha(), 8, width, height)
+        buf.copy_area(x, y, width, height, window, 0, 0)
+        return segmentation.pixel_array(window.read_pixel_bytes().get_data(),
+                                        width, height,
+                                        window.get_rowstride(),
+                                        window.get_n_channels())
+
+    def load_buffer(self, filename, name):
+        key = (self.current_image, name, None)
+        buf = self.buffer_manager.get(key)
+        if buf is None:
+            try:
+                buf = GdkPixbuf.Pixbuf.new_from_file(filename)
+            except GLib.Error:
+                return None
+            self.buffer_manager.add(key, buf, BufferManager.DECODED, pin=True)
+        else:
+            self.buffer_manager.pin(key)
+        return buf
+
+    def report_memory_usage(self):
+        status_string = 'Image memory: %i / %i MB' % (
+            self.buffer_manager.get_usage_mb(),
+            self.buffer_manager.get_limit_mb())
+        self.status_bar.remove_all(self.status_memory)
+        self.status_bar.push(self.status_memory, status_string)
+
+    def get_preferences(self):
+        preferences = {'memory_limit': self.buffer_manager.get_limit_mb(),
+                       'merge_tolerance': self.merge_tolerance,
+                       'lod_zoom': self.lod_zoom,
+                       'lod_cell_size': self.lod_cell_size,
+                       'suggest_min_area': self.suggest_min_area,
+                       'windowed_mp': self.windowed_mp}
+        return preferences
+
+    def set_preferences(self, preferences):
+        if 'memory_limit' in preferences:
+            self.buffer_manager.set_limit(preferences['memory_limit'])
+            self.report_memory_usage()
+        if 'merge_tolerance' in preferences:
+            self.merge_tolerance = preferences['merge_tolerance']
+        if 'lod_zoom' in preferences:
+            self.lod_zoom = preferences['lod_zoom']
+        if 'lod_cell_size' in preferences:
+            self.lod_cell_size = preferences['lod_cell_size']
+        if 'suggest_min_area' in preferences:
+            self.suggest_min_area = preferences['suggest_min_area']
+        if 'windowed_mp' in preferences:
+            self.windowed_mp = preferences['windowed_mp']
+        self.draw_markings()
+
     def resize(self, widget, event):
         if event.width != self.window_width \
                 or event.height != self.window_height:
@@ -522,12 +1219,76 @@ class Handler:
         height = self.v_adjust.get_page_size()
         draw = self.draw_image_and_buf
         buf_new = self.scale_image(draw, height, width)
+        self.buffer_manager.add('draw', buf_new, BufferManager.SCALED,
+                                pin=True)
         self.draw_image_and_buf = self.buf_and_image(buf_new, draw.image)
+        if self.image_backend is not None:
+            self.render_viewport()
 
     def move_draw_image(self):
         x = self.h_adjust.get_value()
         y = self.v_adjust.get_value()
         self.layout.move(self.draw_image, x, y)
+        if self.image_backend is not None:
+            self.render_viewport()
+
+    def open_image_backend(self, filename):
+        if not filename.lower().endswith('.npy'):
+            size = image_info.image_size(filename)
+            if size is None or size[0] * size[1] <= self.windowed_mp * 1e6:
+                return None
+        try:
+            return image_backends.open_backend(filename)
+        except (OSError, ValueError) as error:
+            status_string = 'Image can not be read windowed: %s' % error
+            self.status_bar.push(self.status_warning, status_string)
+            return None
+
+    def render_viewport(self):
+        # only the part of the image in view is read and scaled.
+        x = int(self.h_adjust.get_value())
+        y = int(self.v_adjust.get_value())
+        width = int(self.h_adjust.get_page_size())
+        height = int(self.v_adjust.get_page_size())
+        key = (self.current_image, self.zoom_percent, x, y, width, height)
+        if key == self.viewport_key:
+            return
+        self.viewport_key = key
+        future = self.viewport_executor.submit(self.render_window,
+                                               self.image_backend, key)
+        future.add_done_callback(
+            lambda done: GLib.idle_add(self.viewport_done, key, done))
+
+    def render_window(self, backend, key):
+        # runs in the viewport thread, views scrolled past are skipped.
+        if key != self.viewport_key:
+            return None
+        _, zoom_percent, x, y, width, height = key
+        return backend.render(x, y, width, height, zoom_percent / 100)
+
+    def viewport_done(self, key, future):
+        if key != self.viewport_key:
+            return False
+        try:
+            rgb = future.result()
+        except (OSError, ValueError):
+            status_string = 'Part of the image could not be read!'
+            self.status_bar.push(self.status_warning, status_string)
+            return False
+        if rgb is None or not rgb.size:
+            return False
+        height, width = rgb.shape[:2]
+        buf = GdkPixbuf.Pixbuf.new_from_bytes(
+            GLib.Bytes.new(rgb.tobytes()), GdkPixbuf.Colorspace.RGB, False,
+            8, width, height, width * 3)
+        original = self.buffers_and_images.get('original')
+        original.image.set_from_pixbuf(buf)
+        self.layout.move(original.image, key[2], key[3])
+        # the window in view is kept for the display adjustments.
+        self.viewport_rgb = (key, rgb)
+        if self.display_adjustments != AdjustDisplayDialog.defaults:
+            self.draw_markings()
+        return False
 
     def scroll(self, x, y, *, delta=False):
         scroll_x = self.h_adjust.get_value()
@@ -550,22 +1311,182 @@ class Handler:
             self.switch_image_button.set_sensitive(False)
             self.show_missing_image_warning = False
 
+    def start_segmentation(self, image, buf):
+        if image in self.segmenting:
+            return
+        self.segmenting.add(image)
+        status_string = 'Segmenting image in the background.'
+        self.status_bar.push(self.status_msg, status_string)
+        worker = threading.Thread(target=self.segment_image,
+                                  args=(image, buf),
+                                  daemon=True)
+        worker.start()
+
+    def segment_image(self, image, buf):
+        # runs in a worker thread, the result is handed to the main loop.
+        bw_buf = None
+        try:
+            width = buf.get_width()
+            height = buf.get_height()
+            data = buf.read_pixel_bytes().get_data()
+            rgb = segmentation.pixel_array(data, width, height,
+                                           buf.get_rowstride(),
+                                           buf.get_n_channels())
+            bw_rgb = segmentation.segment(rgb, self.segmenter)
+            bw_bytes = GLib.Bytes.new(bw_rgb.tobytes())
+            bw_buf = GdkPixbuf.Pixbuf.new_from_bytes(
+                bw_bytes, GdkPixbuf.Colorspace.RGB, False, 8,
+                width, height, width * 3)
+            try:
+                cache_file = segmentation.cache_filename(image)
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                bw_buf.savev(cache_file, 'png', [], [])
+            except (OSError, GLib.Error):
+                pass
+        except (KeyError, ValueError, ImportError, AttributeError):
+            bw_buf = None
+        finally:
+            # the image can be segmented again whatever the segmenter did.
+            GLib.idle_add(self.segmentation_done, image, bw_buf)
+
+    def segmentation_done(self, image, bw_buf):
+        self.segmenting.discard(image)
+        if bw_buf is None:
+            status_string = 'Segmentation of the image failed!'
+            self.status_bar.push(self.status_warning, status_string)
+            return False
+        pin = image == self.current_image
+        self.buffer_manager.add((image, 'bw', None), bw_buf,
+                                BufferManager.DECODED, pin=pin)
+        if pin:
+            bw = self.buffers_and_images.get('bw')
+            self.buffers_and_images['bw'] = self.buf_and_image(bw_buf,
+                                                               bw.image)
+            self.switch_image_button.set_sensitive(True)
+            self.show_missing_image_warning = True
+            status_string = 'Computer annotated image generated.'
+            self.status_bar.push(self.status_msg, status_string)
+            self.zoom()
+        return False
+
+    def suggest_markings(self):
+        if self.point_type is None:
+            status_string = 'No point types loaded!'
+            self.status_bar.push(self.status_msg, status_string)
+            return
+        buf = self.buffers_and_images.get('bw').buf
+        if buf is None:
+            self.warn_annotated_image()
+            return
+        status_string = 'Finding suggestions in the background.'
+        self.status_bar.push(self.status_msg, status_string)
+        args = (self.current_image, buf, self.point_type,
+                self.point_type_color, self.do_draw_bounding_boxes)
+        worker = threading.Thread(target=self.find_suggestions,
+                                  args=args,
+                                  daemon=True)
+        worker.start()
+
+    def find_suggestions(self, image, buf, point_type, color, box):
+        # runs in a worker thread, the result is handed to the main loop.
+        data = buf.read_pixel_bytes().get_data()
+        rgb = segmentation.pixel_array(data, buf.get_width(),
+                                       buf.get_height(),
+                                       buf.get_rowstride(),
+                                       buf.get_n_channels())
+        blobs = segmentation.find_blobs(rgb[..., 0] > 127,
+                                        self.suggest_min_area)
+        suggestions = []
+        for cx, cy, x0, y0, x1, y1, area in blobs.tolist():
+            if box:
+                args = (image, point_type, x0, y0, x1, y1, True)
+            else:
+                args = (image, point_type, cx, cy, None, None, False)
+            suggestions.append(self.point(*args, *color))
+        GLib.idle_add(self.suggestions_done, image, suggestions)
+
+    def suggestions_done(self, image, suggestions):
+        self.suggestions[image] = suggestions
+        if image == self.current_image:
+            label_text = '%i suggestions' % len(suggestions)
+            self.update_label(label_text)
+            self.draw_markings()
+        return False
+
+    def accept_suggestions(self):
+        suggestions = self.suggestions.pop(self.current_image, [])
+        if not suggestions:
+            return
+        self.mark_unsaved()
+        for point in suggestions:
+            self.store.add(point)
+            self.make_new_summary(point, add=True)
+        label_text = '%i suggestions accepted' % len(suggestions)
+        self.update_label(label_text)
+        self.update_summary()
+        self.draw_markings()
+
+    def reject_suggestions(self):
+        suggestions = self.suggestions.pop(self.current_image, [])
+        label_text = '%i suggestions rejected' % len(suggestions)
+        self.update_label(label_text)
+        self.draw_markings()
+
+    def reject_suggestion(self, event):
+        suggestions = self.suggestions.get(self.current_image)
+        if not suggestions or event.type != Gdk.EventType.BUTTON_RELEASE:
+            return False
+        x, y = self.scale_to_zoom(event.x, event.y, divide=True)
+        # a click inside a box rejects it, the smallest box when they overlap.
+        boxes = [p for p in suggestions if p.box and
+                 min(p.x, p.x2) <= x <= max(p.x, p.x2) and
+                 min(p.y, p.y2) <= y <= max(p.y, p.y2)]
+        if boxes:
+            suggestions.remove(min(boxes, key=lambda p: abs(
+                (p.x2 - p.x) * (p.y2 - p.y))))
+            return True
+        points = [p for p in suggestions if not p.box]
+        if not points:
+            return False
+        closest = min(points, key=lambda p: (p.x - x) ** 2 + (p.y - y) ** 2)
+        dist = self.scale_to_zoom(sqrt((closest.x - x) ** 2 +
+                                       (closest.y - y) ** 2))
+        if dist < self.radius:
+            suggestions.remove(closest)
+            return True
+        return False
+
     def point_type_changed(self, button):
         model = button.get_model()
         active = button.get_active()
         if active >= 0:
-            code = model[active][0]
-            color = self.hex_color_to_rgba(code)
-            self.point_type_color = color
             self.point_type = model[active][1]
-        self.update_summary()
+            code = self.type_registry.color(self.point_type, model[active][0])
+            self.point_type_color = self.hex_color_to_rgba(code)
+        self.update_summary_fonts()
 
     def handle_shortcuts(self, event_box, event):
         key_name = Gdk.keyval_name(event.keyval)
-        self.switch_point_type(key_name)
+        if key_name == 'Delete':
+            self.delete_selection()
+        elif key_name == 'Escape':
+            self.shortcut_keys = ''
+            self.selection = {}
+            self.draw_markings()
+        else:
+            key = chr(Gdk.keyval_to_unicode(event.keyval))
+            if key.isprintable() and key.strip():
+                self.switch_point_type(key)
+
+    def mark_unsaved(self):
+        self.points_saved = False
+        self.edit_count = self.edit_count + 1
+        self.dirty_images.add(self.current_image)
 
     def save_points_shortcut(self):
-        if self.current_point_file is None:
+        if self.sidecar_project is not None:
+            self.save_sidecars()
+        elif self.current_point_file is None:
             self.file_dialog(self.save_points_button)
         else:
             self.save_points(self.current_point_file)
@@ -578,16 +1499,43 @@ class Handler:
             else:
                 button.set_active(True)
 
-    def switch_point_type(self, key_name):
-        try:
-            idx = int(key_name) - 1
-            if idx in range(len(self.gtk_point_type_list)):
-                self.point_type_button.set_active(idx)
-        except ValueError:
-            pass
+    def switch_point_type(self, key):
+        # a shortcut that starts a longer one waits for the next key.
+        if self.shortcut_timer is not None:
+            GLib.source_remove(self.shortcut_timer)
+            self.shortcut_timer = None
+        keys = self.shortcut_keys + key
+        name, longer = self.type_registry.lookup(keys)
+        if name is None and not longer and self.shortcut_keys:
+            # the waiting shortcut is used and the key starts a new one.
+            self.shortcut_done()
+            keys = key
+            name, longer = self.type_registry.lookup(keys)
+        self.shortcut_keys = ''
+        if longer:
+            self.shortcut_keys = keys
+            self.shortcut_timer = GLib.timeout_add(self.shortcut_timeout,
+                                                   self.shortcut_done)
+        elif name is not None:
+            self.select_point_type(name)
+
+    def shortcut_done(self):
+        name, _ = self.type_registry.lookup(self.shortcut_keys)
+        self.shortcut_keys = ''
+        self.shortcut_timer = None
+        if name is not None:
+            self.select_point_type(name)
+        return False
+
+    def select_point_type(self, name):
+        idx = self.type_registry.index(name)
+        if idx is not None:
+            self.point_type_button.set_active(idx)
 
     def mouse_move(self, event_box, event):
-        if self.do_drag:
+        if self.do_select_drag:
+            self.drag_selection(event)
+        elif self.do_drag:
             self.make_line_marking(event)
         elif self.do_scroll:
             self.scroll(event.x, event.y)
@@ -605,8 +1553,14 @@ class Handler:
         self.draw_live(point)
 
     def add_remove_point(self, event_box, event):
-        if event.button == 1:
-            if event.state & Gdk.ModifierType.CONTROL_MASK:
+        if event.button == 1 and self.do_select:
+            self.select_markings(event)
+        elif event.button == 1:
+            if event.type == Gdk.EventType.BUTTON_RELEASE and \
+                    self.drag_id is not None:
+                self.finish_marking_drag()
+                self.pressed_on_point = False
+            elif event.state & Gdk.ModifierType.CONTROL_MASK:
                 self.remove_marking(event)
             else:
                 self.pressed_on_point = self.find_closest_point(event)
@@ -615,7 +1569,8 @@ class Handler:
         elif event.button == 2:
             self.button_scroll(event)
         elif event.button == 3:
-            self.remove_marking(event)
+            if not self.reject_suggestion(event):
+                self.remove_marking(event)
         self.draw_markings()
 
     def button_scroll(self, event):
@@ -629,56 +1584,30 @@ class Handler:
 
     def find_closest_point(self, point):
         scaled_p = self.scale_to_zoom(point.x, point.y, divide=True)
-        dist_keep = np.inf
+        dist_keep = inf
         p_keep = None
-        for p in self.point_list:
-            if p.image == self.current_image:
-                dist_head = self.get_dist(p, scaled_p)
-                dist_tail = self.get_dist(p, scaled_p, head=False)
-                dist = min(dist_head, dist_tail)
-                if dist < dist_keep:
-                    dist_keep = dist
-                    p_keep = p
-                    if dist == dist_head:
-                        self.pressed_on_point_head = True
-                        self.pressed_on_point_tail = False
-                    else:
-                        self.pressed_on_point_tail = True
-                        self.pressed_on_point_head = False
+        id_keep = None
+        for marking_id, p in self.store.items(self.current_image):
+            dist_head = annotations.get_dist(p, scaled_p)
+            dist_tail = annotations.get_dist(p, scaled_p, head=False)
+            dist = min(dist_head, dist_tail)
+            if dist < dist_keep:
+                dist_keep = dist
+                p_keep = p
+                id_keep = marking_id
+                if dist == dist_head:
+                    self.pressed_on_point_head = True
+                    self.pressed_on_point_tail = False
+                else:
+                    self.pressed_on_point_tail = True
+                    self.pressed_on_point_head = False
         dist_keep = self.scale_to_zoom(dist_keep)
         smaller_then_radius = dist_keep < self.radius
         if smaller_then_radius:
             self.point_clicked = p_keep
+            self.point_clicked_id = id_keep
         return smaller_then_radius
 
-    @staticmethod
-    def get_dist(marking, point=None, head=True):
-        x1 = marking[2]
-        y1 = marking[3]
-        if point is None:
-            x2 = marking[4]
-            y2 = marking[5]
-            if x2 is None:
-                return 0
-        else:
-            x2 = point[0]
-            y2 = point[1]
-            if not head:
-                x1 = marking[4]
-                y1 = marking[5]
-                if x1 is None:
-                    return np.inf
-        return sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-
-    @staticmethod
-    def get_angle(marking):
-        if marking.x2 is None:
-            return 0
-        else:
-            angle = atan2(-(marking.y2 - marking.y),
-                          (marking.x2 - marking.x)) / pi * 180
-            return angle
-
     def check_if_clicked_on_marking(self, event):
         if self.point_type is not None:
             if self.check_if_click(event):
@@ -691,8 +1620,9 @@ class Handler:
 
     def remove_marking(self, event):
         if self.check_if_clicked_on_marking(event):
-            self.points_saved = False
-            self.point_list.remove(self.point_clicked)
+            self.mark_unsaved()
+            self.store.remove(self.point_clicked_id)
+            self.selection.pop(self.point_clicked_id, None)
             label_text = 'removed: (%i, %i)' % (int(event.x), int(event.y))
             self.update_label(label_text)
             self.make_new_summary(self.point_clicked, add=False)
@@ -708,11 +1638,18 @@ class Handler:
             sign = -1
         key = self.current_image + '--' + point.type
         summary = self.point_summary_dict.get(key)
-        size = self.get_dist(point)
+        if summary is None:
+            summary = self.summary_init_values(
+                annotations.rgba_color_to_hex(point))
+        size = annotations.get_dist(point)
         new_summary = self.summary_values(summary.amount + sign*1,
                                           summary.size + sign*size,
                                           summary.color)
-        self.point_summary_dict[key] = new_summary
+        if new_summary.amount > 0:
+            self.point_summary_dict[key] = new_summary
+        else:
+            # only types used on an image get a row.
+            self.point_summary_dict.pop(key, None)
 
     def check_if_click(self, event, do_drag=False):
         if event.type == Gdk.EventType.BUTTON_PRESS:
@@ -740,7 +1677,7 @@ class Handler:
             self.status_bar.push(self.status_msg, status_string)
 
     def add_size_mark(self, event):
-        self.points_saved = False
+        self.mark_unsaved()
         args = self.scale_to_zoom(self.pressed_x,
                                   self.pressed_y,
                                   event.x,
@@ -748,19 +1685,19 @@ class Handler:
                                   divide=True)
         box = self.do_draw_bounding_boxes
         point = self.make_point(*args, box)
-        self.point_list.append(point)
-        label_text = '%s %i px, %i degrees' % (self.point_type,
-                                               int(self.get_dist(point)),
-                                               int(self.get_angle(point)))
+        self.store.add(point)
+        label_text = '%s %i px, %i degrees' % (
+            self.point_type, int(annotations.get_dist(point)),
+            int(annotations.get_angle(point)))
         self.update_label(label_text)
         self.make_new_summary(point, add=True)
         self.update_summary()
 
     def add_point(self, event):
-        self.points_saved = False
+        self.mark_unsaved()
         args = self.scale_to_zoom(event.x, event.y, divide=True)
         point = self.make_point(*args)
-        self.point_list.append(point)
+        self.store.add(point)
         label_text = '%s (%i, %i)' % (self.point_type,
                                       int(point.x),
                                       int(point.y))
@@ -769,21 +1706,139 @@ class Handler:
         self.update_summary()
 
     def move_marking_live(self, event):
+        if self.drag_id is None:
+            self.start_marking_drag()
         point = self.point_clicked
         new_coord = self.scale_to_zoom(event.x, event.y, divide=True)
         if self.pressed_on_point_head:
             new_point = point._replace(x=new_coord[0], y=new_coord[1])
         else:
             new_point = point._replace(x2=new_coord[0], y2=new_coord[1])
-        self.point_list.remove(point)
-        self.point_list.append(new_point)
-        self.change_size_in_summary(point, new_point)
-        self.update_summary()
+        self.store.replace(self.drag_id, new_point)
+        self.draw_marking_live(new_point)
         return new_point
 
+    def start_marking_drag(self):
+        # the other markings are drawn once, the dragged one on top of them.
+        self.mark_unsaved()
+        self.drag_id = self.point_clicked_id
+        self.drag_start = self.point_clicked
+        self.draw_markings()
+        self.draw_temp = self.draw_image_and_buf
+        self.draw_buf_temp = self.draw_temp.image.get_pixbuf()
+
+    def finish_marking_drag(self):
+        point = self.store.get(self.drag_id)
+        self.change_size_in_summary(self.drag_start, point)
+        self.drag_id = None
+        self.drag_start = None
+        label_text = '%s moved to (%i, %i)' % (point.type, int(point.x),
+                                               int(point.y))
+        self.update_label(label_text)
+        self.update_summary()
+
+    def select_markings(self, event):
+        if event.type == Gdk.EventType.BUTTON_PRESS:
+            self.check_if_click(event)
+            self.do_select_drag = True
+            self.lasso = [(event.x, event.y)]
+            self.move_selection = self.find_closest_point(event) and \
+                self.point_clicked_id in self.selection
+        elif event.type == Gdk.EventType.BUTTON_RELEASE:
+            self.do_select_drag = False
+            self.selection_offset = (0, 0)
+            clicked = self.check_if_click(event)
+            if self.move_selection:
+                if not clicked:
+                    self.move_selected(*self.scale_to_zoom(
+                        event.x - self.pressed_x,
+                        event.y - self.pressed_y,
+                        divide=True))
+                return
+            if not event.state & Gdk.ModifierType.CONTROL_MASK:
+                self.selection = {}
+            if clicked:
+                found = []
+                if self.find_closest_point(event):
+                    found = [self.point_clicked_id]
+            elif event.state & Gdk.ModifierType.SHIFT_MASK:
+                polygon = [tuple(self.scale_to_zoom(x, y, divide=True))
+                           for x, y in self.lasso]
+                found = self.store.query_polygon(self.current_image, polygon)
+            else:
+                args = self.scale_to_zoom(self.pressed_x, self.pressed_y,
+                                          event.x, event.y, divide=True)
+                found = self.store.query_rect(self.current_image, *args)
+            for marking_id in found:
+                self.selection[marking_id] = self.store.get(marking_id)
+            label_text = '%i markings selected' % len(self.selection)
+            self.update_label(label_text)
+
+    def drag_selection(self, event):
+        if self.move_selection:
+            self.selection_offset = self.scale_to_zoom(
+                event.x - self.pressed_x,
+                event.y - self.pressed_y,
+                divide=True)
+            self.draw_markings()
+        else:
+            self.lasso.append((event.x, event.y))
+            lasso = event.state & Gdk.ModifierType.SHIFT_MASK
+            self.draw_selection_live(event.x, event.y, lasso)
+
+    def replace_selected(self, replace):
+        if not self.selection:
+            return
+        self.mark_unsaved()
+        for marking_id, p in self.selection.items():
+            new_p = replace(p)
+            self.store.replace(marking_id, new_p)
+            self.make_new_summary(p, add=False)
+            self.make_new_summary(new_p, add=True)
+            self.selection[marking_id] = new_p
+        self.update_summary()
+        self.draw_markings()
+
+    @staticmethod
+    def move_point(p, dx, dy):
+        if p.x2 is None:
+            return p._replace(x=p.x + dx, y=p.y + dy)
+        return p._replace(x=p.x + dx, y=p.y + dy,
+                          x2=p.x2 + dx, y2=p.y2 + dy)
+
+    def move_selected(self, dx, dy):
+        self.replace_selected(lambda p: self.move_point(p, dx, dy))
+        label_text = 'moved %i markings' % len(self.selection)
+        self.update_label(label_text)
+
+    def retype_selection(self):
+        if self.point_type is None:
+            status_string = 'No point types loaded!'
+            self.status_bar.push(self.status_msg, status_string)
+            return
+        color = self.point_type_color._asdict()
+        self.replace_selected(lambda p: p._replace(type=self.point_type,
+                                                   **color))
+        label_text = '%i markings changed to %s' % (len(self.selection),
+                                                    self.point_type)
+        self.update_label(label_text)
+
+    def delete_selection(self):
+        if not self.selection:
+            return
+        self.mark_unsaved()
+        for marking_id, p in self.selection.items():
+            self.store.remove(marking_id)
+            self.make_new_summary(p, add=False)
+        label_text = 'removed %i markings' % len(self.selection)
+        self.update_label(label_text)
+        self.selection = {}
+        self.update_summary()
+        self.draw_markings()
+
     def change_size_in_summary(self, point_old, point_new):
-        size_old = self.get_dist(point_old)
-        size_new = self.get_dist(point_new)
+        size_old = annotations.get_dist(point_old)
+        size_new = annotations.get_dist(point_new)
         key = self.current_image + '--' + point_old.type
         summary = self.point_summary_dict.get(key)
         new_summary = self.summary_values(summary.amount,
@@ -791,7 +1846,46 @@ class Handler:
                                           summary.color)
         self.point_summary_dict[key] = new_summary
 
+    def toggle_filmstrip(self):
+        if self.filmstrip is None:
+            self.filmstrip = Filmstrip(self.open_image)
+            self.vertical_box.pack_start(self.filmstrip.scroll_window,
+                                         False, True, 0)
+            self.filmstrip.scroll_window.show_all()
+            self.update_filmstrip()
+        elif self.filmstrip.scroll_window.get_visible():
+            self.filmstrip.scroll_window.hide()
+        else:
+            self.filmstrip.scroll_window.show()
+            self.update_filmstrip()
+
+    def update_filmstrip(self):
+        if self.filmstrip is None or \
+                not self.filmstrip.scroll_window.get_visible():
+            return
+        if not self.list_of_images and self.image_folder:
+            self.get_list_of_images()
+        self.filmstrip.set_images(self.list_of_images)
+        counts = {}
+        for key, summary in self.point_summary_dict.items():
+            image = key.split('--')[0]
+            counts[image] = counts.get(image, 0) + summary.amount
+        self.filmstrip.set_counts(counts)
+        self.filmstrip.select(self.current_image)
+
+    def update_filmstrip_count(self, image):
+        # an edit only changes the count of its own image.
+        if self.filmstrip is None or \
+                not self.filmstrip.scroll_window.get_visible():
+            return
+        prefix = image + '--'
+        count = sum(summary.amount
+                    for key, summary in self.point_summary_dict.items()
+                    if key.startswith(prefix))
+        self.filmstrip.set_count(image, count)
+
     def update_summary(self):
+        self.update_filmstrip_count(self.current_image)
         self.gtk_point_summary_list.clear()
         old_image = ''
         idx = 0
@@ -815,6 +1909,19 @@ class Handler:
                                                 summary.color])
             idx = idx + 1
 
+    def update_summary_fonts(self):
+        # only the fonts of the current image change with the point type.
+        starts = [idx for idx, image in self.tree_image_index.items()
+                  if image == self.current_image]
+        if not starts:
+            return
+        idx = starts[0] + 1
+        while idx < len(self.gtk_point_summary_list) and \
+                idx not in self.tree_image_index:
+            row = self.gtk_point_summary_list[idx]
+            row[3] = self.get_font(self.current_image, row[0])[1]
+            idx = idx + 1
+
     def get_font(self, image, point_type):
         if image == self.current_image:
             image_font = self.bold_font
@@ -845,6 +1952,48 @@ class Handler:
         draw_buf = Gdk.pixbuf_get_from_surface(surface, 0, 0, width, height)
         self.draw_temp.image.set_from_pixbuf(draw_buf)
 
+    def draw_marking_live(self, point):
+        width = self.draw_buf_temp.get_width()
+        height = self.draw_buf_temp.get_height()
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        cr = cairo.Context(surface)
+        Gdk.cairo_set_source_pixbuf(cr, self.draw_buf_temp, 0, 0)
+        cr.paint()
+        args = self.get_draw_coordinate(point)
+        cr.set_source_rgba(point.r, point.g, point.b, point.a)
+        self.draw_circle(cr, args[0], args[1])
+        if point.box:
+            self.draw_box(cr, *args)
+        elif args[3] is not None:
+            self.draw_line(cr, *args)
+        surface = cr.get_target()
+        draw_buf = Gdk.pixbuf_get_from_surface(surface, 0, 0, width, height)
+        self.draw_temp.image.set_from_pixbuf(draw_buf)
+
+    def draw_selection_live(self, x, y, lasso=False):
+        width = self.draw_buf_temp.get_width()
+        height = self.draw_buf_temp.get_height()
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        cr = cairo.Context(surface)
+        Gdk.cairo_set_source_pixbuf(cr, self.draw_buf_temp, 0, 0)
+        cr.paint()
+        offset_x = self.h_adjust.get_value()
+        offset_y = self.v_adjust.get_value()
+        if lasso:
+            for lasso_x, lasso_y in self.lasso:
+                cr.line_to(lasso_x - offset_x, lasso_y - offset_y)
+            cr.close_path()
+        else:
+            cr.rectangle(self.pressed_x - offset_x, self.pressed_y - offset_y,
+                         x - self.pressed_x, y - self.pressed_y)
+        cr.set_source_rgba(1, 1, 1, 1)
+        cr.set_line_width(1)
+        cr.set_dash([4, 4])
+        cr.stroke()
+        surface = cr.get_target()
+        draw_buf = Gdk.pixbuf_get_from_surface(surface, 0, 0, width, height)
+        self.draw_temp.image.set_from_pixbuf(draw_buf)
+
     def shift_coordinates(self, point):
         offset = (self.h_adjust.get_value(), self.v_adjust.get_value())
         args = (point.x - offset[0], point.y - offset[1],
@@ -864,26 +2013,130 @@ class Handler:
         height = draw_buf.get_height()
         surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
         cr = cairo.Context(surface)
+        if self.display_adjustments != AdjustDisplayDialog.defaults:
+            tile = self.get_adjusted_tile(width, height)
+            if tile is not None:
+                cr.set_source_surface(tile, 0, 0)
+                cr.paint()
         Gdk.cairo_set_source_pixbuf(cr, draw_buf, 0, 0)
         cr.paint()
-        for point in self.point_list:
-            if point.image == self.current_image or \
-                    self.override_point_image_match:
-                args = self.get_draw_coordinate(point)
-                cr.set_source_rgba(point.r, point.g, point.b, point.a)
-                self.draw_circle(cr, args[0], args[1])
-                if point.box:
-                    self.draw_box(cr, *args)
-                elif args[3] is not None:
-                    self.draw_line(cr, *args)
+        if self.overlay_opacity > 0:
+            tile = self.get_overlay_tile(width, height)
+            if tile is not None:
+                cr.set_source_surface(tile, 0, 0)
+                cr.paint_with_alpha(self.overlay_opacity)
+        if self.zoom_percent < self.lod_zoom:
+            self.draw_markings_overview(cr, width, height)
+        else:
+            self.draw_markings_full(cr)
         surface = cr.get_target()
         draw_buf = Gdk.pixbuf_get_from_surface(surface, 0, 0, width, height)
         draw.image.set_from_pixbuf(draw_buf)
 
+    def draw_markings_full(self, cr):
+        image = None
+        if not self.override_point_image_match:
+            image = self.current_image
+        for marking_id, point in self.store.items(image):
+            if marking_id == self.drag_id:
+                continue
+            selected = marking_id in self.selection
+            if selected:
+                point = self.move_point(point, *self.selection_offset)
+            args = self.get_draw_coordinate(point)
+            cr.set_source_rgba(point.r, point.g, point.b, point.a)
+            self.draw_circle(cr, args[0], args[1])
+            if point.box:
+                self.draw_box(cr, *args)
+            elif args[3] is not None:
+                self.draw_line(cr, *args)
+            if selected:
+                self.draw_selected(cr, args[0], args[1])
+        for point in self.suggestions.get(self.current_image, []):
+            args = self.get_draw_coordinate(point)
+            cr.set_source_rgba(point.r, point.g, point.b, point.a)
+            self.draw_suggestion(cr, point.box, *args)
+
+    def get_marking_arrays(self):
+        image = None
+        if not self.override_point_image_match:
+            image = self.current_image
+        # the arrays are made again when the store changed the image.
+        version = self.store.image_version(image)
+        cached = self.marking_arrays.get(image)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        points = list(self.store.points(image))
+        types = {}
+        for p in points:
+            if p.type not in types:
+                types[p.type] = (len(types), (p.r, p.g, p.b, p.a))
+        xs = np.fromiter((p.x for p in points), float, len(points))
+        ys = np.fromiter((p.y for p in points), float, len(points))
+        type_idx = np.fromiter((types[p.type][0] for p in points),
+                               int, len(points))
+        colors = [color for _, color in types.values()]
+        arrays = (xs, ys, type_idx, colors)
+        self.marking_arrays[image] = (version, arrays)
+        return arrays
+
+    def draw_markings_overview(self, cr, width, height):
+        xs, ys, type_idx, colors = self.get_marking_arrays()
+        if not len(xs):
+            return
+        factor = self.zoom_percent / 100
+        xs = xs * factor - self.h_adjust.get_value()
+        ys = ys * factor - self.v_adjust.get_value()
+        visible = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        xs = xs[visible]
+        ys = ys[visible]
+        type_idx = type_idx[visible]
+        cell = self.lod_cell_size
+        columns = int(width // cell) + 1
+        n_cells = columns * (int(height // cell) + 1)
+        cell_idx = (ys // cell).astype(int) * columns + \
+            (xs // cell).astype(int)
+        counts = np.bincount(cell_idx, minlength=n_cells)
+        occupied = np.flatnonzero(counts)
+        mean_x = np.bincount(cell_idx, xs, n_cells)[occupied] / \
+            counts[occupied]
+        mean_y = np.bincount(cell_idx, ys, n_cells)[occupied] / \
+            counts[occupied]
+        n_types = len(colors)
+        type_counts = np.bincount(cell_idx * n_types + type_idx,
+                                  minlength=n_cells * n_types)
+        dominant = type_counts.reshape(n_cells, n_types)[occupied].argmax(1)
+        cr.set_font_size(10)
+        for x, y, count, t in zip(mean_x, mean_y, counts[occupied], dominant):
+            radius = min(cell / 2, self.radius / 2 + 2 * log2(count))
+            cr.set_source_rgba(*colors[t])
+            cr.arc(x, y, radius, 0, 2 * pi)
+            cr.fill()
+            if count > 1:
+                cr.set_source_rgba(1, 1, 1, 1)
+                cr.move_to(x - radius / 2, y + 4)
+                cr.show_text(str(count))
+
     def draw_circle(self, cr, x, y):
         cr.arc(x, y, self.radius, 0, 2 * pi)
         cr.fill()
 
+    def draw_selected(self, cr, x, y):
+        cr.set_source_rgba(1, 1, 1, 1)
+        cr.arc(x, y, self.radius + 2, 0, 2 * pi)
+        cr.set_line_width(2)
+        cr.stroke()
+
+    def draw_suggestion(self, cr, box, x, y, x2, y2):
+        cr.set_line_width(2)
+        cr.set_dash([4, 4])
+        if box:
+            cr.rectangle(x, y, x2 - x, y2 - y)
+        else:
+            cr.arc(x, y, self.radius, 0, 2 * pi)
+        cr.stroke()
+        cr.set_dash([])
+
     def draw_line(self, cr, x, y, x2, y2):
         cr.move_to(x, y)
         cr.line_to(x2, y2)
@@ -930,8 +2183,11 @@ class Handler:
             self.status_bar.push(self.status_msg, status_string)
 
     def get_list_of_images(self):
-        files = list(self.get_files_in_dir())
-        self.list_of_images = sorted(files, key=lambda x: x)
+        key = (self.image_folder, os.stat(self.image_folder).st_mtime)
+        if key not in self.folder_images:
+            files = list(self.get_files_in_dir())
+            self.folder_images[key] = sorted(files, key=lambda x: x)
+        self.list_of_images = self.folder_images[key]
 
     def get_files_in_dir(self):
         for file in os.listdir(self.image_folder):
@@ -941,6 +2197,8 @@ class Handler:
                 pass
             elif file.endswith('png'):
                 yield os.path.join(self.image_folder, file)
+            elif file.lower().endswith(('.tif', '.tiff')):
+                yield os.path.join(self.image_folder, file)
 
     @staticmethod
     def add_image_filters(dialog):
@@ -952,6 +2210,10 @@ class Handler:
         filter_png.set_name('Png images')
         filter_png.add_mime_type('image/png')
         dialog.add_filter(filter_png)
+        filter_tiff = Gtk.FileFilter()
+        filter_tiff.set_name('Tiff images')
+        filter_tiff.add_mime_type('image/tiff')
+        dialog.add_filter(filter_tiff)
         filter_any = Gtk.FileFilter()
         filter_any.set_name('Any files')
         filter_any.add_pattern('*')
@@ -974,10 +2236,27 @@ class Handler:
 
     def open_image_folder(self, filename):
         self.image_folder = filename
+        self.list_of_images = []
         self.open_next_image(self.next_image_button)
 
+    def open_file(self, filename):
+        if os.path.isdir(filename):
+            self.open_image_folder(filename)
+        elif filename.lower().endswith(('.csv', '.csv.gz', '.csv.zst')):
+            with annotations.open_points(filename) as csv_file:
+                header = next(csv.reader(csv_file), [])
+            if header and header[0].strip() == 'color':
+                self.load_point_types(filename)
+            elif not self.warning_dialog_response():
+                self.load_points(filename)
+        else:
+            self.open_image(filename)
+
     def open_image(self, filename):
         self.current_image = filename
+        self.selection = {}
+        if os.path.dirname(filename) != self.image_folder:
+            self.list_of_images = []
         self.image_folder = os.path.dirname(filename)
         status_string = 'Image and computer annotated image opened.'
         self.status_bar.push(self.status_msg, status_string)
@@ -985,71 +2264,125 @@ class Handler:
         self.previous_image_button.set_sensitive(True)
         self.switch_image_button.set_sensitive(True)
         self.show_missing_image_warning = True
+        self.buffer_manager.set_pinned(['draw'])
+        self.image_backend = self.open_image_backend(filename)
+        if self.image_backend is None:
+            self.load_image_layers(filename)
+        else:
+            self.load_windowed_layers()
+        self.zoom_percent = 100
+        if self.sidecar_project is not None:
+            self.load_sidecar(filename)
+        self.update_summary()
+        self.update_filmstrip()
+        self.zoom()
+
+    def load_image_layers(self, filename):
         original = self.buffers_and_images.get('original')
-        original.image.set_from_file(filename)
-        new_original_buf = original.image.get_pixbuf()
+        new_original_buf = self.load_buffer(filename, 'original')
+        original.image.set_from_pixbuf(new_original_buf)
+        self.layout.move(original.image, 0, 0)
         new_original = self.buf_and_image(new_original_buf,
                                           original.image)
         self.buffers_and_images['original'] = new_original
         bw = self.buffers_and_images.get('bw')
         bw_filename = filename[0:-4] + '_annotated.png'
-        bw.image.set_from_file(bw_filename)
-        new_bw_buf = bw.image.get_pixbuf()
+        if not os.path.isfile(bw_filename):
+            bw_filename = segmentation.cache_filename(filename)
+        new_bw_buf = self.load_buffer(bw_filename, 'bw')
+        if new_bw_buf is None and new_original_buf is not None:
+            self.start_segmentation(filename, new_original_buf)
+        bw.image.set_from_pixbuf(new_bw_buf)
         new_bw = self.buf_and_image(new_bw_buf, bw.image)
         self.buffers_and_images['bw'] = new_bw
-        self.zoom_percent = 100
         self.image_width = new_original.buf.get_width()
         self.image_height = new_original.buf.get_height()
-        for pt in self.gtk_point_type_list:
-            key = self.current_image + '--' + pt[1]
-            if key not in self.point_summary_dict:
-                new_dict = {key: self.summary_init_values(pt[0])}
-                self.point_summary_dict.update(new_dict)
-        self.update_summary()
-        self.zoom()
+
+    def load_windowed_layers(self):
+        # the image is never decoded whole, so there is no bw layer.
+        for name, bi in self.buffers_and_images.items():
+            bi.image.clear()
+            self.buffers_and_images[name] = self.buf_and_image(None,
+                                                               bi.image)
+        self.switch_image_button.set_sensitive(False)
+        self.image_width = self.image_backend.width
+        self.image_height = self.image_backend.height
+        self.viewport_key = None
+        self.viewport_rgb = None
 
     def load_point_types(self, filename):
         status_string = 'Point types loaded.'
         self.status_bar.push(self.status_msg, status_string)
+        self.type_registry = point_types.read_point_types(filename)
+        # the combo box is detached while the rows are added.
+        self.point_type_button.set_model(None)
         self.gtk_point_type_list.clear()
-        image = self.current_image.split(self.dir_delimiter)
-        self.gtk_point_summary_list.append([image[-1], '', '', self.font,
-                                            self.background_color])
-        with open(filename, newline='') as csv_file:
-            reader = csv.reader(csv_file, delimiter=',')
-            reader.__next__()
-            sort_points = sorted(reader, key=lambda x: x[1])
-            for point in sort_points:
-                self.update_point_types(point)
+        for pt in self.type_registry:
+            self.gtk_point_type_list.append([pt.color, pt.name])
+        self.point_type_button.set_model(self.gtk_point_type_list)
         self.point_type_button.set_active(0)
         self.draw_markings()
 
-    def update_point_types(self, row):
-        self.gtk_point_type_list.append(row)
-        key = self.current_image + '--' + row[1]
-        self.point_summary_dict.update({key: self.summary_init_values(row[0])})
-        self.update_summary()
-
     def save_points(self, filename):
+        if self.saving:
+            status_string = 'Still saving the points!'
+            self.status_bar.push(self.status_msg, status_string)
+            return
+        if self.sidecar_project is not None:
+            self.load_all_sidecars()
         self.current_point_file = filename
-        status_string = 'points saved'
+        self.saving = True
+        status_string = 'Saving points in the background.'
         self.status_bar.push(self.status_msg, status_string)
-        self.points_saved = True
-        header = ['image', 'type', 'x1', 'y1', 'x2', 'y2', 'box'
-                  'red', 'green', 'blue', 'alpha']
-        with open(filename, 'w') as csv_file:
-            writer = csv.writer(csv_file)
-            writer.writerow(header)
-            for p in self.point_list:
-                writer.writerow(p)
+        self.progress_bar.set_text(None)
+        self.progress_bar.set_fraction(0.0)
+        # the markings are immutable, so a list of them is a snapshot.
+        snapshot = list(self.store)
+        worker = threading.Thread(target=self.write_points,
+                                  args=(filename, snapshot, self.edit_count),
+                                  daemon=True)
+        worker.start()
+
+    def write_points(self, filename, snapshot, edit_count):
+        # runs in a worker thread, the result is handed to the main loop.
+        def progress(fraction):
+            GLib.idle_add(self.progress_bar.set_fraction, fraction)
+        error = None
+        try:
+            annotations.write_points(filename, snapshot, progress)
+        except Exception as write_error:
+            error = write_error
+        finally:
+            # the saving flag is reset whatever happens in the thread.
+            GLib.idle_add(self.save_done, edit_count, error)
+
+    def save_done(self, edit_count, error, status_string='points saved',
+                  images=()):
+        self.saving = False
+        if error is not None:
+            # the images are written again on the next save.
+            self.dirty_images.update(images)
+            status_string = 'Saving the points failed: %s' % error
+            self.status_bar.push(self.status_warning, status_string)
+            return False
+        # markings added while saving are still unsaved.
+        if edit_count == self.edit_count:
+            self.points_saved = True
+        self.status_bar.push(self.status_msg, status_string)
+        self.progress_bar.set_text('Done!')
+        return False
 
     def load_points(self, filename):
         self.current_point_file = filename
+        self.sidecar_project = None
+        self.dirty_images = set()
+        self.selection = {}
+        self.marking_arrays = {}
         status_string = 'Point loaded.'
         self.status_bar.push(self.status_msg, status_string)
-        self.point_list = []
+        self.store.clear()
         self.gtk_point_summary_list.clear()
-        with open(filename, newline='') as csv_file:
+        with annotations.open_points(filename) as csv_file:
             reader = csv.reader(csv_file, delimiter=',')
             reader.__next__()
             image_point_match = self.points_parser(reader)
@@ -1058,57 +2391,257 @@ class Handler:
                 self.override_point_image_match = True
         self.make_summary_dict()
         self.update_summary()
+        self.update_filmstrip()
         self.points_saved = True
         self.draw_markings()
 
-    @staticmethod
-    def point_parser(row):
-        args = []
-        for data in row:
-            try:
-                args.append(float(data))
-            except ValueError:
-                if data == 'True':
-                    args.append(True)
-                elif data == 'False':
-                    args.append(False)
-                elif not data:
-                    args.append(None)
-                else:
-                    args.append(data)
-        return args
-
     def points_parser(self, reader):
         image_point_match = False
-        for row in reader:
-            if not row:
-                pass
-            else:
-                args = self.point_parser(row)
-                if args[0] == self.current_image:
-                    image_point_match = True
-                self.point_list.append(self.point(*args))
+        for p in annotations.points_parser(reader):
+            if p.image == self.current_image:
+                image_point_match = True
+            self.store.add(p)
         return image_point_match
 
     def make_summary_dict(self):
         self.point_summary_dict.clear()
-        for p in self.point_list:
-            color = self.rgba_color_to_hex(p)
-            key = p.image + '--' + p.type
-            size = self.get_dist(p)
-            if key not in self.point_summary_dict:
-                values = self.summary_values(1, size, color)
-            else:
-                values = self.point_summary_dict.get(key)
-                values = self.summary_values(values.amount + 1,
-                                             values.size + size,
-                                             color)
+        self.point_summary_dict.update(self.store.summary())
+
+    def open_sidecar_project(self, project_dir):
+        self.sidecar_project = project_dir
+        self.current_point_file = None
+        self.override_point_image_match = False
+        self.store.clear()
+        self.loaded_sidecars = set()
+        self.dirty_images = set()
+        self.selection = {}
+        self.marking_arrays = {}
+        self.point_summary_dict.clear()
+        # only the index is read, the markings are loaded when needed.
+        for image, point_type, amount, size, color in \
+                sidecars.read_index(project_dir):
+            key = image + '--' + point_types.type_name(point_type)
+            values = self.summary_values(amount, size, color)
             self.point_summary_dict.update({key: values})
-        for pt in self.gtk_point_type_list:
-            key = self.current_image + '--' + pt[1]
-            if key not in self.point_summary_dict:
-                new_dict = {key: self.summary_init_values(pt[0])}
-                self.point_summary_dict.update(new_dict)
+        if self.current_image != 'None':
+            self.load_sidecar(self.current_image)
+        status_string = 'Marking project opened.'
+        self.status_bar.push(self.status_msg, status_string)
+        self.update_summary()
+        self.update_filmstrip()
+        self.points_saved = True
+        self.draw_markings()
+
+    def load_sidecar(self, image):
+        if image in self.loaded_sidecars:
+            return
+        self.loaded_sidecars.add(image)
+        for row in sidecars.read_sidecar(image, self.sidecar_project):
+            self.store.add(annotations.parse_point(row, image))
+        for key in [k for k in self.point_summary_dict
+                    if k.split('--')[0] == image]:
+            del self.point_summary_dict[key]
+        self.point_summary_dict.update(self.store.summary(image))
+
+    def load_all_sidecars(self):
+        images = {key.split('--')[0] for key in self.point_summary_dict}
+        for image in images:
+            self.load_sidecar(image)
+
+    def save_sidecars(self):
+        if self.saving:
+            status_string = 'Still saving the points!'
+            self.status_bar.push(self.status_msg, status_string)
+            return
+        self.saving = True
+        # the changed images and the summary are snapshot for the thread.
+        images = {image: list(self.store.points(image))
+                  for image in self.dirty_images}
+        self.dirty_images = set()
+        entries = []
+        for key, summary in sorted(self.point_summary_dict.items()):
+            image, point_type = key.split('--')
+            entries.append((image, point_type, summary.amount,
+                            summary.size, summary.color))
+        status_string = 'Saving markings to the project in the background.'
+        self.status_bar.push(self.status_msg, status_string)
+        self.progress_bar.set_text(None)
+        self.progress_bar.set_fraction(0.0)
+        worker = threading.Thread(target=self.write_sidecars,
+                                  args=(self.sidecar_project, images,
+                                        entries, self.edit_count),
+                                  daemon=True)
+        worker.start()
+
+    def write_sidecars(self, project_dir, images, entries, edit_count):
+        # runs in a worker thread like write_points.
+        error = None
+        try:
+            for idx, (image, points) in enumerate(images.items()):
+                sidecars.write_sidecar(image, points, project_dir)
+                GLib.idle_add(self.progress_bar.set_fraction,
+                              (idx + 1) / (len(images) + 1))
+            sidecars.write_index(project_dir, entries)
+        except Exception as write_error:
+            error = write_error
+        finally:
+            GLib.idle_add(self.save_done, edit_count, error,
+                          'Markings saved to project.', list(images))
+
+    def sidecar_project_dialog(self):
+        if self.warning_dialog_response():
+            return True
+        response = (Gtk.STOCK_CANCEL,
+                    Gtk.ResponseType.CANCEL,
+                    Gtk.STOCK_OPEN,
+                    Gtk.ResponseType.OK)
+        dialog = Gtk.FileChooserDialog('Choose a marking project folder',
+                                       self.main_window,
+                                       Gtk.FileChooserAction.SELECT_FOLDER,
+                                       response)
+        if self.image_folder is not None:
+            dialog.set_current_folder(self.image_folder)
+        response = dialog.run()
+        if response == Gtk.ResponseType.OK:
+            self.open_sidecar_project(dialog.get_filename())
+        dialog.destroy()
+
+    def merge_dialog(self):
+        if self.warning_dialog_response():
+            return True
+        response = (Gtk.STOCK_CANCEL,
+                    Gtk.ResponseType.CANCEL,
+                    Gtk.STOCK_OPEN,
+                    Gtk.ResponseType.OK)
+        dialog = Gtk.FileChooserDialog('Choose the marking files to merge',
+                                       self.main_window,
+                                       Gtk.FileChooserAction.OPEN,
+                                       response)
+        dialog.set_select_multiple(True)
+        self.add_text_filters(dialog)
+        response = dialog.run()
+        files = dialog.get_filenames()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK or not files:
+            return
+        response = (Gtk.STOCK_CANCEL,
+                    Gtk.ResponseType.CANCEL,
+                    Gtk.STOCK_SAVE,
+                    Gtk.ResponseType.OK)
+        dialog = Gtk.FileChooserDialog('Save merged markings as',
+                                       self.main_window,
+                                       Gtk.FileChooserAction.SAVE,
+                                       response)
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_name('merged.csv')
+        self.add_text_filters(dialog)
+        response = dialog.run()
+        output = dialog.get_filename()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK:
+            return
+        # the files are checked before the merge is scheduled.
+        try:
+            merger = merge_markings.Merger(files, output,
+                                           tolerance=self.merge_tolerance)
+        except (OSError, ValueError) as error:
+            self.merge_failed(error)
+            return
+        self.progress_bar.set_text(None)
+        task = self.merge_with_progress(merger, output)
+        GObject.idle_add(task.__next__)
+
+    def merge_failed(self, error):
+        status_string = 'Merging the markings failed: %s' % error
+        self.status_bar.push(self.status_warning, status_string)
+
+    def merge_with_progress(self, merger, output):
+        try:
+            for progress in merger.iter_merge():
+                self.progress_bar.set_fraction(progress)
+                yield True
+        except (OSError, ValueError, IndexError) as error:
+            self.merge_failed(error)
+            yield False
+            return
+        self.load_points(output)
+        status_string = '%i markings merged, %i duplicates removed, ' \
+                        '%i conflicts' % merger.result()
+        self.status_bar.push(self.status_msg, status_string)
+        self.progress_bar.set_text('Done!')
+        yield False
+
+    def export_dialog(self, export_format):
+        if export_format == 'coco':
+            text = 'Export markings to coco json as'
+            action = Gtk.FileChooserAction.SAVE
+        else:
+            text = 'Choose a folder to export markings to'
+            action = Gtk.FileChooserAction.SELECT_FOLDER
+        response = (Gtk.STOCK_CANCEL,
+                    Gtk.ResponseType.CANCEL,
+                    Gtk.STOCK_SAVE,
+                    Gtk.ResponseType.OK)
+        dialog = Gtk.FileChooserDialog(text, self.main_window, action,
+                                       response)
+        if export_format == 'coco':
+            dialog.set_do_overwrite_confirmation(True)
+            dialog.set_current_name('annotations.json')
+        if self.image_folder is not None:
+            dialog.set_current_folder(self.image_folder)
+        response = dialog.run()
+        output = dialog.get_filename()
+        dialog.destroy()
+        if response == Gtk.ResponseType.OK:
+            if self.sidecar_project is not None:
+                self.load_all_sidecars()
+            classes = self.type_registry.classes()
+            # the gui is not forked into the worker processes.
+            context = multiprocessing.get_context('spawn')
+            images = exporters.group_markings(self.store)
+            exporter = exporters.Exporter(images, classes, export_format,
+                                          output, mp_context=context)
+            self.progress_bar.set_text(None)
+            task = self.export_with_progress(exporter)
+            GObject.idle_add(task.__next__)
+
+    def export_with_progress(self, exporter):
+        for progress in exporter.iter_export():
+            self.progress_bar.set_fraction(progress)
+            yield True
+        status_string = '%i images exported' % (len(exporter.images) -
+                                                len(exporter.missing))
+        if exporter.missing:
+            status_string = status_string + ', %i images not found' % len(
+                exporter.missing)
+        self.status_bar.push(self.status_msg, status_string)
+        self.progress_bar.set_text('Done!')
+        yield False
+
+    def validate_markings(self):
+        if self.sidecar_project is not None:
+            self.load_all_sidecars()
+        types = self.type_registry.names() or None
+        context = multiprocessing.get_context('spawn')
+        images = exporters.group_markings(self.store)
+        validator = validate.Validator(images, types, mp_context=context)
+        status_string = 'Validating the markings.'
+        self.status_bar.push(self.status_msg, status_string)
+        self.progress_bar.set_text(None)
+        task = self.validate_with_progress(validator)
+        GObject.idle_add(task.__next__)
+
+    def validate_with_progress(self, validator):
+        for progress in validator.iter_validate():
+            self.progress_bar.set_fraction(progress)
+            yield True
+        status_string = '%i issues in %i images' % (len(validator.issues),
+                                                    len(validator.images))
+        self.status_bar.push(self.status_msg, status_string)
+        self.progress_bar.set_text('Done!')
+        ValidationDialog(self.main_window, validator.issues,
+                         validator.counts(), self.open_image)
+        yield False
 
     def file_dialog(self, button):
         text = 'Choose a file'
@@ -1172,5 +2705,7 @@ class Handler:
 
 
 if __name__ == '__main__':
+    # help and usage errors are printed here and not in a running instance.
+    cl_arg(sys.argv[1:])
     app = App()
-    app.run()
+    app.run(sys.argv)
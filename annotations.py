@@ -0,0 +1,338 @@
+import csv
+import gzip
+import io
+from collections import namedtuple
+from math import sqrt, pi, atan2, inf
+
+from atomic_files import atomic_write
+from point_types import type_name
+from spatial_index import SpatialIndex
+
+HEADER = ['image', 'type', 'x1', 'y1', 'x2', 'y2', 'box',
+          'red', 'green', 'blue', 'alpha']
+
+# named tuples used.
+color = namedtuple('color', ['r', 'g', 'b', 'a'])
+point = namedtuple('point', ('image', 'type', 'x', 'y', 'x2', 'y2', 'box')
+                   + color._fields)
+summary_values = namedtuple('summary_values', ['amount', 'size', 'color'])
+
+
+def point_parser(row):
+    args = []
+    for data in row:
+        try:
+            args.append(float(data))
+        except ValueError:
+            if data == 'True':
+                args.append(True)
+            elif data == 'False':
+                args.append(False)
+            elif not data:
+                args.append(None)
+            else:
+                args.append(data)
+    return args
+
+
+def parse_point(row, image=None):
+    args = point_parser(row)
+    if image is not None:
+        args[0] = image
+    args[1] = type_name(row[1])
+    return point(*args)
+
+
+def points_parser(reader):
+    # markings are made one row at a time, so files can be streamed.
+    for row in reader:
+        if row:
+            yield parse_point(row)
+
+
+def compression_module(filename):
+    # the compression follows the file ending, .gz or .zst.
+    if filename.endswith('.gz'):
+        return gzip
+    if filename.endswith('.zst'):
+        try:
+            from compression import zstd
+        except ImportError:
+            import zstandard as zstd
+        return zstd
+    return None
+
+
+def open_points(filename, mode='r', target=None):
+    # an open binary file can be given, with its name as the target.
+    module = compression_module(target or filename)
+    if module is None:
+        if hasattr(filename, 'read'):
+            return io.TextIOWrapper(filename, newline='')
+        return open(filename, mode, newline='')
+    return module.open(filename, mode + 't', newline='')
+
+
+def iter_points(filename):
+    with open_points(filename) as csv_file:
+        reader = csv.reader(csv_file, delimiter=',')
+        next(reader, None)
+        yield from points_parser(reader)
+
+
+def write_points(filename, markings, progress=None, every=10000):
+    total = len(markings) or 1
+    # the compression follows the real file name, not the temporary one.
+    def opener(temp_name):
+        return open_points(temp_name, 'w', filename)
+    with atomic_write(filename, opener) as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(HEADER)
+        for start in range(0, len(markings), every):
+            writer.writerows(markings[start:start + every])
+            if progress is not None:
+                progress(min(start + every, total) / total)
+
+
+def get_dist(marking, point=None, head=True):
+    x1 = marking[2]
+    y1 = marking[3]
+    if point is None:
+        x2 = marking[4]
+        y2 = marking[5]
+        if x2 is None:
+            return 0
+    else:
+        x2 = point[0]
+        y2 = point[1]
+        if not head:
+            x1 = marking[4]
+            y1 = marking[5]
+            if x1 is None:
+                return inf
+    return sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+
+
+def get_angle(marking):
+    if marking.x2 is None:
+        return 0
+    else:
+        angle = atan2(-(marking.y2 - marking.y),
+                      (marking.x2 - marking.x)) / pi * 180
+        return angle
+
+
+def rgba_color_to_hex(rgba):
+    rgb = (int(rgba.r * 255), int(rgba.g * 255), int(rgba.b * 255))
+    hex_color = '#%02X%02X%02X' % rgb
+    return hex_color
+
+
+def summary_key(image, point_type):
+    return image + '--' + point_type
+
+
+def add_to_summary(summary, p):
+    key = summary_key(p.image, p.type)
+    size = get_dist(p)
+    values = summary.get(key)
+    if values is None:
+        values = summary_values(1, size, rgba_color_to_hex(p))
+    else:
+        values = summary_values(values.amount + 1, values.size + size,
+                                rgba_color_to_hex(p))
+    summary[key] = values
+
+
+def make_summary_dict(markings):
+    summary = {}
+    for p in markings:
+        add_to_summary(summary, p)
+    return summary
+
+
+def marking_arrays(markings):
+    # coordinates as arrays, nan where a point has no second coordinate.
+    import numpy as np
+    markings = list(markings)
+    columns = []
+    for idx in range(2, 6):
+        columns.append(np.fromiter((np.nan if p[idx] is None else p[idx]
+                                    for p in markings),
+                                   float, len(markings)))
+    return columns
+
+
+def get_dists(markings):
+    import numpy as np
+    xs, ys, x2s, y2s = marking_arrays(markings)
+    dists = np.hypot(x2s - xs, y2s - ys)
+    return np.nan_to_num(dists, nan=0)
+
+
+def get_angles(markings):
+    import numpy as np
+    xs, ys, x2s, y2s = marking_arrays(markings)
+    angles = np.degrees(np.arctan2(-(y2s - ys), x2s - xs))
+    return np.nan_to_num(angles, nan=0)
+
+
+class AnnotationStore:
+    # markings by id, with indexes by image, by type and by region.
+    def __init__(self, markings=(), cell_size=256):
+        self.cell_size = cell_size
+        self.version = 0
+        self.clear()
+        self.extend(markings)
+
+    def clear(self):
+        self.markings = {}
+        self.by_image = {}
+        self.by_type = {}
+        self.spatial_indexes = {}
+        self.next_id = 0
+        self.changed()
+
+    def __len__(self):
+        return len(self.markings)
+
+    def __iter__(self):
+        return iter(self.markings.values())
+
+    def __contains__(self, marking_id):
+        return marking_id in self.markings
+
+    def add(self, marking):
+        marking_id = self.next_id
+        self.next_id = self.next_id + 1
+        self.markings[marking_id] = marking
+        self.by_image.setdefault(marking.image, {})[marking_id] = None
+        self.by_type.setdefault(marking.type, {})[marking_id] = None
+        self.index_insert(marking_id, marking)
+        self.changed(marking.image)
+        return marking_id
+
+    def extend(self, markings):
+        return [self.add(marking) for marking in markings]
+
+    def get(self, marking_id):
+        return self.markings.get(marking_id)
+
+    def remove(self, marking_id):
+        marking = self.markings.pop(marking_id)
+        self.unlink(self.by_image, marking.image, marking_id)
+        self.unlink(self.by_type, marking.type, marking_id)
+        self.index_remove(marking_id, marking)
+        self.changed(marking.image)
+        return marking
+
+    @staticmethod
+    def unlink(index, key, marking_id):
+        ids = index[key]
+        del ids[marking_id]
+        if not ids:
+            del index[key]
+
+    def replace(self, marking_id, marking):
+        # the marking keeps its id and its place in the order.
+        old = self.markings[marking_id]
+        if old.image != marking.image:
+            self.unlink(self.by_image, old.image, marking_id)
+            self.by_image.setdefault(marking.image, {})[marking_id] = None
+        if old.type != marking.type:
+            self.unlink(self.by_type, old.type, marking_id)
+            self.by_type.setdefault(marking.type, {})[marking_id] = None
+        self.index_remove(marking_id, old)
+        self.markings[marking_id] = marking
+        self.index_insert(marking_id, marking)
+        self.changed(old.image)
+        self.changed(marking.image)
+        return old
+
+    def changed(self, image=None):
+        # the versions only grow, caches keep the version they were made of.
+        self.version = self.version + 1
+        if image is None:
+            self.image_versions = {}
+            self.cleared_version = self.version
+        else:
+            self.image_versions[image] = self.version
+
+    def image_version(self, image=None):
+        if image is None:
+            return self.version
+        return self.image_versions.get(image, self.cleared_version)
+
+    def find(self, marking):
+        for marking_id in self.by_image.get(marking.image, ()):
+            if self.markings[marking_id] == marking:
+                return marking_id
+        return None
+
+    def ids(self, image=None, point_type=None):
+        if image is None and point_type is None:
+            return list(self.markings)
+        if point_type is None:
+            return list(self.by_image.get(image, ()))
+        type_ids = self.by_type.get(point_type, {})
+        if image is None:
+            return list(type_ids)
+        return [marking_id for marking_id in self.by_image.get(image, ())
+                if marking_id in type_ids]
+
+    def items(self, image=None, point_type=None):
+        for marking_id in self.ids(image, point_type):
+            yield marking_id, self.markings[marking_id]
+
+    def points(self, image=None, point_type=None):
+        for marking_id in self.ids(image, point_type):
+            yield self.markings[marking_id]
+
+    def images(self):
+        return list(self.by_image)
+
+    def types(self):
+        return list(self.by_type)
+
+    def get_spatial_index(self, image):
+        index = self.spatial_indexes.get(image)
+        if index is None:
+            index = SpatialIndex(cell_size=self.cell_size)
+            self.spatial_indexes[image] = index
+            for marking_id, marking in self.items(image):
+                self.index_insert(marking_id, marking)
+        return index
+
+    def index_insert(self, marking_id, marking):
+        # the spatial index is keyed by the store ids, never reused.
+        index = self.spatial_indexes.get(marking.image)
+        if index is not None:
+            index.insert(marking, marking_id)
+
+    def index_remove(self, marking_id, marking):
+        index = self.spatial_indexes.get(marking.image)
+        if index is not None:
+            index.remove(marking, marking_id)
+
+    def query_rect(self, image, left, top, right, bottom):
+        index = self.get_spatial_index(image)
+        return [marking_id for marking_id, _ in
+                index.query_rect_items(left, top, right, bottom)]
+
+    def query_polygon(self, image, polygon):
+        index = self.get_spatial_index(image)
+        return [marking_id for marking_id, _ in
+                index.query_polygon_items(polygon)]
+
+    def summary(self, image=None):
+        return make_summary_dict(self.points(image))
+
+    def dists(self, image=None, point_type=None):
+        return get_dists(self.points(image, point_type))
+
+    def angles(self, image=None, point_type=None):
+        return get_angles(self.points(image, point_type))
+
+
+def read_points(filename, cell_size=256):
+    return AnnotationStore(iter_points(filename), cell_size)
@@ -0,0 +1,38 @@
+import os
+from contextlib import contextmanager
+
+
+def open_csv(filename):
+    return open(filename, 'w', newline='')
+
+
+def fsync_directory(filename):
+    # the rename is only durable once the folder is synced too.
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    folder = os.path.dirname(os.path.abspath(filename))
+    fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(filename, opener=open_csv):
+    # written to a temporary file that replaces the old one when complete.
+    temp_name = '%s.%i.tmp' % (filename, os.getpid())
+    try:
+        with opener(temp_name) as out_file:
+            yield out_file
+        fd = os.open(temp_name, os.O_RDWR)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(temp_name, filename)
+        fsync_directory(filename)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
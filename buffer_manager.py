@@ -0,0 +1,95 @@
+from collections import OrderedDict, namedtuple
+
+
+class BufferManager:
+    # priorities, lower priorities are evicted first.
+    CACHED = 0
+    SCALED = 1
+    DECODED = 2
+
+    def __init__(self, limit_mb=1024):
+        self.entry = namedtuple('entry', ['buf', 'size', 'priority'])
+        self.entries = OrderedDict()
+        self.pinned = set()
+        self.usage = 0
+        self.limit = limit_mb * 1024 ** 2
+
+    @staticmethod
+    def size_of(buf):
+        try:
+            return buf.get_byte_length()
+        except AttributeError:
+            pass
+        try:
+            return buf.get_rowstride() * buf.get_height()
+        except AttributeError:
+            return getattr(buf, 'nbytes', 0)
+
+    def set_limit(self, limit_mb):
+        self.limit = int(limit_mb) * 1024 ** 2
+        self.evict()
+
+    def get_limit_mb(self):
+        return self.limit // 1024 ** 2
+
+    def get_usage_mb(self):
+        return self.usage / 1024 ** 2
+
+    def add(self, key, buf, priority=CACHED, pin=False):
+        if buf is None:
+            return None
+        self.remove(key)
+        size = self.size_of(buf)
+        self.entries[key] = self.entry(buf, size, priority)
+        self.usage = self.usage + size
+        if pin:
+            self.pin(key)
+        self.evict()
+        return buf
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry.buf
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.usage = self.usage - entry.size
+        self.pinned.discard(key)
+
+    def remove_matching(self, match):
+        for key in [k for k in self.entries if match(k)]:
+            self.remove(key)
+
+    def pin(self, key):
+        # pinned entries are never evicted.
+        if key in self.entries:
+            self.pinned.add(key)
+
+    def unpin(self, key):
+        self.pinned.discard(key)
+        self.evict()
+
+    def set_pinned(self, keys):
+        self.pinned = {key for key in keys if key in self.entries}
+        self.evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.pinned.clear()
+        self.usage = 0
+
+    def evict(self):
+        if self.usage <= self.limit:
+            return
+        priorities = sorted({e.priority for e in self.entries.values()})
+        for priority in priorities:
+            # entries are kept in least recently used order.
+            for key, entry in list(self.entries.items()):
+                if self.usage <= self.limit:
+                    return
+                if entry.priority == priority and key not in self.pinned:
+                    self.remove(key)
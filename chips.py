@@ -0,0 +1,209 @@
+import argparse
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from exporters import image_prefix, read_markings, resolve_image
+from segmentation import pixel_array
+
+
+def cl_arg():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+        description='Cut training chips around markings.')
+    parser.add_argument('points',
+                        type=str,
+                        help='File of saved points in csv (%(type)s).')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        required=True,
+                        help='Folder to save the chips in (%(type)s).')
+    parser.add_argument('--size',
+                        type=int,
+                        default=64,
+                        help='Width and height of the chips (%(type)s).')
+    parser.add_argument('--format',
+                        type=str,
+                        choices=('png', 'npy'),
+                        default='png',
+                        help='png files or one npy stack per image '
+                             '(%(type)s).')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        help='Number of processes (%(type)s).')
+    parser.add_argument('--batch',
+                        type=int,
+                        default=256,
+                        help='Chips cut at a time per process (%(type)s).')
+    arguments = parser.parse_args()
+    return arguments
+
+
+def raw_cache_filename(image):
+    return image + '.npy'
+
+
+def decode_image(filename):
+    # a raw cache is memory mapped, otherwise the image is decoded once.
+    raw_cache = raw_cache_filename(filename)
+    if os.path.isfile(raw_cache):
+        return np.load(raw_cache, mmap_mode='r')
+    import gi
+    gi.require_version('GdkPixbuf', '2.0')
+    from gi.repository import GdkPixbuf, GLib
+    try:
+        buf = GdkPixbuf.Pixbuf.new_from_file(filename)
+    except GLib.Error:
+        return None
+    data = buf.read_pixel_bytes().get_data()
+    return pixel_array(data, buf.get_width(), buf.get_height(),
+                       buf.get_rowstride(), buf.get_n_channels())
+
+
+def save_png(filename, chip):
+    import gi
+    gi.require_version('GdkPixbuf', '2.0')
+    from gi.repository import GdkPixbuf, GLib
+    height, width = chip.shape[:2]
+    if chip.ndim == 2:
+        chip = chip[:, :, None]
+    if chip.shape[2] < 3:
+        # gray, with or without alpha, is saved as rgb.
+        chip = np.concatenate((np.repeat(chip[:, :, :1], 3, axis=2),
+                               chip[:, :, 1:2]), axis=2)
+    chip = np.ascontiguousarray(chip[:, :, :4])
+    channels = chip.shape[2]
+    buf = GdkPixbuf.Pixbuf.new_from_bytes(GLib.Bytes.new(chip.tobytes()),
+                                          GdkPixbuf.Colorspace.RGB,
+                                          channels == 4, 8, width, height,
+                                          width * channels)
+    buf.savev(filename, 'png', [], [])
+
+
+def marking_centers(markings):
+    # points, line midpoints and box centers.
+    xs = np.array([m[1] if m[3] is None else (m[1] + m[3]) / 2
+                   for m in markings])
+    ys = np.array([m[2] if m[4] is None else (m[2] + m[4]) / 2
+                   for m in markings])
+    return xs, ys
+
+
+def cut_chips(image, xs, ys, size):
+    height, width = image.shape[:2]
+    # chips are shifted inside the image instead of padding it.
+    left = np.clip(np.round(xs - size / 2).astype(int), 0,
+                   max(width - size, 0))
+    top = np.clip(np.round(ys - size / 2).astype(int), 0,
+                  max(height - size, 0))
+    offsets = np.arange(size)
+    rows = np.minimum(top[:, None] + offsets, height - 1)
+    columns = np.minimum(left[:, None] + offsets, width - 1)
+    return image[rows[:, :, None], columns[:, None, :]]
+
+
+def extract_image(job):
+    image, markings, output, size, chip_format, batch, root = job
+    filename = resolve_image(image, root)
+    try:
+        pixels = decode_image(filename)
+    except (OSError, ValueError):
+        pixels = None
+    if pixels is None:
+        return image, []
+    name = image_prefix(image)
+    xs, ys = marking_centers(markings)
+    rows = []
+    stack = None
+    if chip_format == 'npy':
+        # the stack is written batch by batch to a memory mapped file.
+        shape = (len(markings), size, size) + pixels.shape[2:]
+        stack = np.lib.format.open_memmap(
+            os.path.join(output, name + '.npy'), mode='w+',
+            dtype=pixels.dtype, shape=shape)
+    for start in range(0, len(markings), batch):
+        end = start + batch
+        chips = cut_chips(pixels, xs[start:end], ys[start:end], size)
+        if stack is not None:
+            stack[start:start + len(chips)] = chips
+        for idx, chip in enumerate(chips, start):
+            if stack is None:
+                chip_name = '%s_%05i.png' % (name, idx)
+                save_png(os.path.join(output, chip_name), chip)
+            else:
+                chip_name = '%s.npy[%i]' % (name, idx)
+            rows.append([chip_name, image, markings[idx][0],
+                         xs[idx], ys[idx]])
+    if stack is not None:
+        stack.flush()
+        del stack
+    return image, rows
+
+
+class ChipExtractor:
+    def __init__(self, images, output, size=64, chip_format='png',
+                 jobs=None, batch=256, root=None, mp_context=None):
+        self.images = images
+        self.output = output
+        self.size = size
+        self.chip_format = chip_format
+        self.jobs = jobs
+        self.batch = batch
+        self.root = root
+        self.mp_context = mp_context
+        self.chips = 0
+        self.missing = []
+
+    def iter_extract(self):
+        os.makedirs(self.output, exist_ok=True)
+        work = ((image, markings, self.output, self.size, self.chip_format,
+                 self.batch, self.root)
+                for image, markings in self.images.items())
+        total = len(self.images) or 1
+        manifest = os.path.join(self.output, 'manifest.csv')
+        # only a few images per process are queued, so memory is bounded.
+        queue_size = 2 * (self.jobs or os.cpu_count() or 1)
+        pending = deque()
+        done = 0
+        with ProcessPoolExecutor(self.jobs, self.mp_context) as executor, \
+                open(manifest, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['chip', 'image', 'type', 'x', 'y'])
+            while True:
+                for job in islice(work, queue_size - len(pending)):
+                    pending.append(executor.submit(extract_image, job))
+                if not pending:
+                    break
+                image, rows = pending.popleft().result()
+                if not rows:
+                    self.missing.append(image)
+                writer.writerows(rows)
+                self.chips = self.chips + len(rows)
+                done = done + 1
+                yield done / total
+
+    def extract(self):
+        for _ in self.iter_extract():
+            pass
+        return self.chips
+
+
+def main():
+    args = cl_arg()
+    images = read_markings(args.points)
+    root = os.path.dirname(os.path.abspath(args.points))
+    extractor = ChipExtractor(images, args.output, args.size, args.format,
+                              args.jobs, args.batch, root)
+    chips = extractor.extract()
+    print('%i chips cut from %i images' % (chips, len(images) -
+                                           len(extractor.missing)))
+    for image in extractor.missing:
+        print('Could not read %s' % image)
+
+
+if __name__ == '__main__':
+    main()
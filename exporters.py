@@ -0,0 +1,260 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from annotations import open_points
+from image_info import image_size
+from point_types import read_point_types, type_name
+
+formats = ('coco', 'yolo', 'voc')
+
+
+def cl_arg():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+        description='Export markings to detection formats.')
+    parser.add_argument('points',
+                        type=str,
+                        help='File of saved points in csv (%(type)s).')
+    parser.add_argument('-t', '--types',
+                        type=str,
+                        required=True,
+                        help='File with point types in csv (%(type)s).')
+    parser.add_argument('-f', '--format',
+                        type=str,
+                        choices=formats,
+                        required=True,
+                        help='Format to export to (%(type)s).')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        required=True,
+                        help='Folder, or json file for coco, to export to '
+                             '(%(type)s).')
+    parser.add_argument('--point-size',
+                        type=float,
+                        default=20,
+                        help='Size of the box around point markings '
+                             '(%(type)s).')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        help='Number of processes (%(type)s).')
+    arguments = parser.parse_args()
+    return arguments
+
+
+def to_float(value):
+    if value in ('', 'None', None):
+        return None
+    return float(value)
+
+
+def group_markings(rows):
+    images = {}
+    for row in rows:
+        if not row:
+            continue
+        image, point_type = row[0], type_name(row[1])
+        x, y, x2, y2 = (to_float(v) for v in row[2:6])
+        box = str(row[6]) == 'True'
+        images.setdefault(image, []).append((point_type, x, y, x2, y2, box))
+    return images
+
+
+def read_markings(filename):
+    with open_points(filename) as csv_file:
+        reader = csv.reader(csv_file, delimiter=',')
+        next(reader, None)
+        return group_markings(reader)
+
+
+def marking_box(marking, point_size):
+    _, x, y, x2, y2, _ = marking
+    if x2 is None:
+        half = point_size / 2
+        return x - half, y - half, x + half, y + half
+    left, right = min(x, x2), max(x, x2)
+    top, bottom = min(y, y2), max(y, y2)
+    return left, top, right, bottom
+
+
+def clip_box(box, width, height):
+    left, top, right, bottom = box
+    return (max(left, 0), max(top, 0),
+            min(right, width), min(bottom, height))
+
+
+def image_boxes(markings, classes, width, height, point_size):
+    # boxes left empty by the clipping are outside the image.
+    for marking in markings:
+        if marking[0] not in classes:
+            continue
+        left, top, right, bottom = clip_box(marking_box(marking, point_size),
+                                            width, height)
+        if right > left and bottom > top:
+            yield marking[0], (left, top, right, bottom)
+
+
+def image_prefix(image):
+    # images with the same name in different folders get different names.
+    name = os.path.splitext(os.path.basename(image))[0]
+    return '%s_%s' % (name, hashlib.md5(image.encode()).hexdigest()[:8])
+
+
+def resolve_image(image, root):
+    if os.path.isabs(image) or os.path.exists(image) or root is None:
+        return image
+    return os.path.join(root, image)
+
+
+def yolo_lines(markings, classes, width, height, point_size):
+    for name, (left, top, right, bottom) in image_boxes(
+            markings, classes, width, height, point_size):
+        yield '%i %.6f %.6f %.6f %.6f\n' % (classes[name],
+                                            (left + right) / 2 / width,
+                                            (top + bottom) / 2 / height,
+                                            (right - left) / width,
+                                            (bottom - top) / height)
+
+
+def voc_xml(image, markings, classes, width, height, point_size):
+    lines = ['<annotation>\n',
+             '  <folder>%s</folder>\n' % escape(os.path.dirname(image)),
+             '  <filename>%s</filename>\n' % escape(os.path.basename(image)),
+             '  <size>\n',
+             '    <width>%i</width>\n' % width,
+             '    <height>%i</height>\n' % height,
+             '    <depth>3</depth>\n',
+             '  </size>\n']
+    for name, (left, top, right, bottom) in image_boxes(
+            markings, classes, width, height, point_size):
+        lines.extend(['  <object>\n',
+                      '    <name>%s</name>\n' % escape(name),
+                      '    <bndbox>\n',
+                      '      <xmin>%i</xmin>\n' % round(left),
+                      '      <ymin>%i</ymin>\n' % round(top),
+                      '      <xmax>%i</xmax>\n' % round(right),
+                      '      <ymax>%i</ymax>\n' % round(bottom),
+                      '    </bndbox>\n',
+                      '  </object>\n'])
+    lines.append('</annotation>\n')
+    return ''.join(lines)
+
+
+def coco_annotations(markings, classes, width, height, point_size):
+    for name, (left, top, right, bottom) in image_boxes(
+            markings, classes, width, height, point_size):
+        yield {'category_id': classes[name] + 1,
+               'bbox': [left, top, right - left, bottom - top],
+               'area': (right - left) * (bottom - top),
+               'iscrowd': 0}
+
+
+def export_image(job):
+    image, markings, export_format, output, classes, point_size, root = job
+    size = image_size(resolve_image(image, root))
+    if size is None:
+        return image, None, None
+    width, height = size
+    name = image_prefix(image)
+    if export_format == 'yolo':
+        with open(os.path.join(output, name + '.txt'), 'w') as txt_file:
+            txt_file.writelines(yolo_lines(markings, classes, width, height,
+                                           point_size))
+        return image, size, None
+    if export_format == 'voc':
+        with open(os.path.join(output, name + '.xml'), 'w') as xml_file:
+            xml_file.write(voc_xml(image, markings, classes, width, height,
+                                   point_size))
+        return image, size, None
+    annotations = list(coco_annotations(markings, classes, width, height,
+                                        point_size))
+    return image, size, annotations
+
+
+class Exporter:
+    def __init__(self, images, classes, export_format, output,
+                 point_size=20, jobs=None, root=None, mp_context=None):
+        self.images = images
+        self.classes = classes
+        self.export_format = export_format
+        self.output = output
+        self.point_size = point_size
+        self.jobs = jobs
+        self.root = root
+        self.mp_context = mp_context
+        self.missing = []
+        if export_format == 'coco':
+            self.folder = os.path.dirname(os.path.abspath(output))
+        else:
+            self.folder = output
+
+    def iter_export(self):
+        os.makedirs(self.folder, exist_ok=True)
+        work = ((image, markings, self.export_format, self.folder,
+                 self.classes, self.point_size, self.root)
+                for image, markings in self.images.items())
+        total = len(self.images) or 1
+        image_entries = []
+        annotation_id = 1
+        with ProcessPoolExecutor(self.jobs, self.mp_context) as executor, \
+                tempfile.TemporaryFile('w+') as annotation_file:
+            results = executor.map(export_image, work, chunksize=16)
+            for idx, (image, size, annotations) in enumerate(results):
+                if size is None:
+                    self.missing.append(image)
+                elif annotations is not None:
+                    image_id = len(image_entries) + 1
+                    image_entries.append({'id': image_id,
+                                          'file_name': image,
+                                          'width': size[0],
+                                          'height': size[1]})
+                    # annotations are spooled to keep the memory bounded.
+                    for annotation in annotations:
+                        annotation['id'] = annotation_id
+                        annotation['image_id'] = image_id
+                        if annotation_id > 1:
+                            annotation_file.write(',\n')
+                        annotation_file.write(json.dumps(annotation))
+                        annotation_id = annotation_id + 1
+                yield (idx + 1) / total
+            if self.export_format == 'coco':
+                self.write_coco(image_entries, annotation_file)
+
+    def write_coco(self, image_entries, annotation_file):
+        categories = [{'id': class_id + 1, 'name': name}
+                      for name, class_id in self.classes.items()]
+        with open(self.output, 'w') as json_file:
+            json_file.write('{"categories": %s,\n' % json.dumps(categories))
+            json_file.write('"images": %s,\n' % json.dumps(image_entries))
+            json_file.write('"annotations": [\n')
+            annotation_file.seek(0)
+            shutil.copyfileobj(annotation_file, json_file)
+            json_file.write('\n]}\n')
+
+    def export(self):
+        for _ in self.iter_export():
+            pass
+        return self.missing
+
+
+def main():
+    args = cl_arg()
+    classes = read_point_types(args.types).classes()
+    images = read_markings(args.points)
+    root = os.path.dirname(os.path.abspath(args.points))
+    exporter = Exporter(images, classes, args.format, args.output,
+                        args.point_size, args.jobs, root)
+    missing = exporter.export()
+    print('%i images exported' % (len(images) - len(missing)))
+    for image in missing:
+        print('Could not read the size of %s' % image)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+import mmap
+import struct
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from buffer_manager import BufferManager
+
+# compressions that can be read.
+NONE, LZW, DEFLATE, ADOBE_DEFLATE, PACKBITS = 1, 5, 8, 32946, 32773
+compressions = (NONE, LZW, DEFLATE, ADOBE_DEFLATE, PACKBITS)
+level = namedtuple('level', ['width', 'height', 'tile_width', 'tile_height',
+                             'offsets', 'counts', 'compression', 'predictor',
+                             'samples', 'photometric', 'colormap', 'scale'])
+# struct formats of the integer field types.
+field_formats = {1: 'B', 3: 'H', 4: 'I', 7: 'B', 13: 'I', 16: 'Q', 18: 'Q'}
+
+
+def lzw_decode(data):
+    # tiff flavour of lzw, msb first with early code width change.
+    table = [bytes([idx]) for idx in range(256)] + [b'', b'']
+    result = bytearray()
+    bit_buffer = 0
+    n_buffered = 0
+    code_width = 9
+    previous = None
+    for byte in data:
+        bit_buffer = (bit_buffer << 8) | byte
+        n_buffered = n_buffered + 8
+        while n_buffered >= code_width:
+            n_buffered = n_buffered - code_width
+            code = bit_buffer >> n_buffered
+            bit_buffer = bit_buffer & ((1 << n_buffered) - 1)
+            if code == 256:
+                del table[258:]
+                code_width = 9
+                previous = None
+                continue
+            if code == 257:
+                return bytes(result)
+            if previous is None:
+                entry = table[code]
+            elif code < len(table):
+                entry = table[code]
+                table.append(previous + entry[:1])
+            else:
+                entry = previous + previous[:1]
+                table.append(entry)
+            result.extend(entry)
+            previous = entry
+            if len(table) + 1 >= (1 << code_width) and code_width < 12:
+                code_width = code_width + 1
+    return bytes(result)
+
+
+def lzw_decode_pillow(data, width, height, samples):
+    # pillow decodes lzw in c, the tile is wrapped in a minimal tiff for it.
+    from io import BytesIO
+    from PIL import Image
+    entries = [(256, 4, width), (257, 4, height), (258, 3, 8), (259, 3, LZW),
+               (262, 3, 2 if samples >= 3 else 1), (273, 4, 0),
+               (277, 3, samples), (278, 4, height), (279, 4, len(data)),
+               (284, 3, 1)]
+    if samples in (2, 4):
+        entries.append((338, 3, 2))
+    data_offset = 8 + 2 + 12 * len(entries) + 4
+    header = struct.pack('<2sHIH', b'II', 42, 8, len(entries))
+    for tag, field_type, value in entries:
+        if tag == 273:
+            value = data_offset
+        header = header + struct.pack('<HHII', tag, field_type, 1, value)
+    header = header + struct.pack('<I', 0)
+    with Image.open(BytesIO(header + bytes(data))) as tile:
+        return tile.tobytes()
+
+
+def packbits_decode(data):
+    result = bytearray()
+    idx = 0
+    while idx < len(data):
+        n = data[idx]
+        idx = idx + 1
+        if n < 128:
+            result.extend(data[idx:idx + n + 1])
+            idx = idx + n + 1
+        elif n > 128:
+            result.extend(data[idx:idx + 1] * (257 - n))
+            idx = idx + 1
+    return bytes(result)
+
+
+def to_rgb(pixels, photometric, colormap):
+    if colormap is not None:
+        return colormap[pixels[:, :, 0]]
+    if pixels.shape[2] >= 3:
+        return pixels[:, :, :3]
+    gray = pixels[:, :, 0]
+    if photometric == 0:
+        gray = 255 - gray
+    return np.repeat(gray[:, :, None], 3, axis=2)
+
+
+def sample_positions(start, size, factor, scale, limit):
+    # position in the level of each displayed pixel, nearest neighbour.
+    positions = ((start + np.arange(size)) / factor * scale).astype(int)
+    return positions[positions < limit]
+
+
+class TiffReader:
+    def __init__(self, filename):
+        with open(filename, 'rb') as image_file:
+            self.data = mmap.mmap(image_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        self.endian = {b'II': '<', b'MM': '>'}.get(self.data[:2])
+        if self.endian is None:
+            raise ValueError('Not a tiff file')
+        version = self.unpack('H', 2)[0]
+        if version == 42:
+            self.big = False
+            offset = self.unpack('I', 4)[0]
+        elif version == 43:
+            self.big = True
+            offset = self.unpack('Q', 8)[0]
+        else:
+            raise ValueError('Not a tiff file')
+        self.ifds = []
+        offsets = [offset]
+        seen = set()
+        while offsets:
+            offset = offsets.pop(0)
+            if not offset or offset in seen:
+                continue
+            seen.add(offset)
+            tags, next_offset = self.read_ifd(offset)
+            self.ifds.append(tags)
+            # overviews are chained or stored as sub files.
+            offsets.append(next_offset)
+            offsets.extend(tags.get(330, ()))
+
+    def unpack(self, fmt, offset, count=1):
+        fmt = '%s%i%s' % (self.endian, count, fmt)
+        return struct.unpack_from(fmt, self.data, offset)
+
+    def read_ifd(self, offset):
+        if self.big:
+            count_format, entry_size, inline_size = 'Q', 20, 8
+        else:
+            count_format, entry_size, inline_size = 'H', 12, 4
+        count = self.unpack(count_format, offset)[0]
+        entries = offset + struct.calcsize(count_format)
+        tags = {}
+        for idx in range(count):
+            entry = entries + idx * entry_size
+            tag, field_type = self.unpack('H', entry, 2)
+            if field_type not in field_formats:
+                continue
+            fmt = field_formats[field_type]
+            n = self.unpack('Q' if self.big else 'I', entry + 4)[0]
+            value_offset = entry + 4 + inline_size
+            if n * struct.calcsize(fmt) > inline_size:
+                value_offset = self.unpack('Q' if self.big else 'I',
+                                           value_offset)[0]
+            tags[tag] = self.unpack(fmt, value_offset, n)
+        next_offset = self.unpack('Q' if self.big else 'I',
+                                  entries + count * entry_size)[0]
+        return tags, next_offset
+
+    def levels(self):
+        levels = []
+        for tags in self.ifds:
+            # transparency masks are skipped.
+            if tags.get(254, (0,))[0] & 4:
+                continue
+            width, height = tags[256][0], tags[257][0]
+            samples = tags.get(277, (1,))[0]
+            compression = tags.get(259, (NONE,))[0]
+            if set(tags.get(258, (8,))) != {8} or compression not in \
+                    compressions or (samples > 1 and
+                                     tags.get(284, (1,))[0] != 1):
+                raise ValueError('Unsupported tiff layout')
+            if 322 in tags:
+                tile_width, tile_height = tags[322][0], tags[323][0]
+                offsets, counts = tags[324], tags[325]
+            else:
+                tile_width = width
+                tile_height = min(tags.get(278, (height,))[0], height)
+                offsets, counts = tags[273], tags[279]
+            colormap = None
+            photometric = tags.get(262, (1,))[0]
+            if photometric == 3 and 320 in tags:
+                colormap = (np.array(tags[320]).reshape(3, -1).T >> 8
+                            ).astype(np.uint8)
+            levels.append(level(width, height, tile_width, tile_height,
+                                offsets, counts, compression,
+                                tags.get(317, (1,))[0], samples, photometric,
+                                colormap, 1.0))
+        if not levels:
+            raise ValueError('No image in tiff file')
+        levels.sort(key=lambda lvl: -lvl.width)
+        full_width = levels[0].width
+        return [lvl._replace(scale=lvl.width / full_width) for lvl in levels]
+
+    def read_tile(self, lvl, idx):
+        offset, count = lvl.offsets[idx], lvl.counts[idx]
+        raw = self.data[offset:offset + count]
+        tile_height = lvl.tile_height
+        if lvl.tile_width == lvl.width:
+            # the last strip can be shorter.
+            tile_height = min(tile_height, lvl.height - idx * tile_height)
+        if lvl.compression == LZW:
+            try:
+                raw = lzw_decode_pillow(raw, lvl.tile_width, tile_height,
+                                        lvl.samples)
+            except (ImportError, OSError, ValueError, SyntaxError):
+                raw = lzw_decode(raw)
+        elif lvl.compression in (DEFLATE, ADOBE_DEFLATE):
+            raw = zlib.decompress(raw)
+        elif lvl.compression == PACKBITS:
+            raw = packbits_decode(raw)
+        size = tile_height * lvl.tile_width * lvl.samples
+        pixels = np.zeros(size, np.uint8)
+        raw = np.frombuffer(raw, np.uint8)[:size]
+        pixels[:len(raw)] = raw
+        pixels = pixels.reshape(tile_height, lvl.tile_width, lvl.samples)
+        if lvl.predictor == 2:
+            pixels = np.cumsum(pixels, axis=1, dtype=np.uint8)
+        return to_rgb(pixels, lvl.photometric, lvl.colormap)
+
+
+class ImageBackend:
+    # reads windows of an image too large to decode, tile by tile.
+    def __init__(self, levels, tile_cache_mb=128):
+        self.levels = levels
+        self.width = levels[0].width
+        self.height = levels[0].height
+        self.tiles = BufferManager(tile_cache_mb)
+
+    def get_tile(self, lvl_idx, idx):
+        # the subclasses read the tiles with read_tile.
+        key = (lvl_idx, idx)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.read_tile(self.levels[lvl_idx], idx)
+            self.tiles.add(key, tile)
+        return tile
+
+    def choose_level(self, factor):
+        # the smallest overview that still has enough pixels.
+        chosen = 0
+        for idx, lvl in enumerate(self.levels):
+            if lvl.scale >= factor:
+                chosen = idx
+        return chosen
+
+    def render(self, x, y, width, height, factor):
+        lvl_idx = self.choose_level(factor)
+        lvl = self.levels[lvl_idx]
+        rows = sample_positions(y, height, factor, lvl.scale, lvl.height)
+        columns = sample_positions(x, width, factor, lvl.scale, lvl.width)
+        result = np.zeros((len(rows), len(columns), 3), np.uint8)
+        if not len(rows) or not len(columns):
+            return result
+        tiles_across = -(-lvl.width // lvl.tile_width)
+        # only the tiles under the view are decoded.
+        for tile_row in range(rows[0] // lvl.tile_height,
+                              rows[-1] // lvl.tile_height + 1):
+            top = tile_row * lvl.tile_height
+            r0, r1 = np.searchsorted(rows, (top, top + lvl.tile_height))
+            if r0 == r1:
+                continue
+            for tile_column in range(columns[0] // lvl.tile_width,
+                                     columns[-1] // lvl.tile_width + 1):
+                left = tile_column * lvl.tile_width
+                c0, c1 = np.searchsorted(columns,
+                                         (left, left + lvl.tile_width))
+                if c0 == c1:
+                    continue
+                tile = self.get_tile(lvl_idx,
+                                     tile_row * tiles_across + tile_column)
+                result[r0:r1, c0:c1] = tile[rows[r0:r1, None] - top,
+                                            columns[None, c0:c1] - left]
+        return result
+
+
+class TiffBackend(ImageBackend):
+    def __init__(self, filename, tile_cache_mb=128):
+        self.reader = TiffReader(filename)
+        super().__init__(self.reader.levels(), tile_cache_mb)
+
+    def read_tile(self, lvl, idx):
+        return self.reader.read_tile(lvl, idx)
+
+
+class RawBackend(ImageBackend):
+    # a raw cache is memory mapped and cut in square tiles.
+    def __init__(self, filename, tile_cache_mb=128, tile_size=1024):
+        pixels = np.load(filename, mmap_mode='r')
+        if pixels.ndim == 2:
+            pixels = pixels[:, :, None]
+        if pixels.ndim != 3 or pixels.dtype != np.uint8:
+            raise ValueError('Unsupported raw cache')
+        self.pixels = pixels
+        height, width, samples = pixels.shape
+        lvl = level(width, height, tile_size, tile_size, (), (), NONE, 1,
+                    samples, 1, None, 1.0)
+        super().__init__([lvl], tile_cache_mb)
+
+    def read_tile(self, lvl, idx):
+        # a view of the memory map, rgb pixels are not copied.
+        tiles_across = -(-lvl.width // lvl.tile_width)
+        top = idx // tiles_across * lvl.tile_height
+        left = idx % tiles_across * lvl.tile_width
+        tile = self.pixels[top:top + lvl.tile_height,
+                           left:left + lvl.tile_width]
+        return to_rgb(tile, lvl.photometric, lvl.colormap)
+
+
+def open_backend(filename, tile_cache_mb=128):
+    if filename.lower().endswith('.npy'):
+        return RawBackend(filename, tile_cache_mb)
+    try:
+        return TiffBackend(filename, tile_cache_mb)
+    except (struct.error, KeyError, IndexError) as error:
+        raise ValueError('Damaged tiff file') from error
@@ -0,0 +1,75 @@
+import struct
+
+
+def png_size(head):
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+        return struct.unpack('>II', head[16:24])
+    return None
+
+
+def jpeg_size(image_file):
+    image_file.seek(2)
+    while True:
+        marker = image_file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF:
+            marker = marker[:1] + image_file.read(1)
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length = struct.unpack('>H', image_file.read(2))[0]
+        # start of frame markers, except DHT, JPG and DAC.
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>xHH', image_file.read(5))
+            return width, height
+        image_file.seek(length - 2, 1)
+
+
+def tiff_size(image_file, head):
+    endian = {b'II': '<', b'MM': '>'}.get(head[:2])
+    if endian is None:
+        return None
+    version = struct.unpack(endian + 'H', head[2:4])[0]
+    if version == 42:
+        offset = struct.unpack(endian + 'I', head[4:8])[0]
+        count_format, entry_size, value_offset = 'H', 12, 8
+    elif version == 43:
+        offset = struct.unpack(endian + 'Q', head[8:16])[0]
+        count_format, entry_size, value_offset = 'Q', 20, 12
+    else:
+        return None
+    image_file.seek(offset)
+    count_size = struct.calcsize(count_format)
+    count = struct.unpack(endian + count_format,
+                          image_file.read(count_size))[0]
+    # short, long and long8 values are stored in the entry itself.
+    value_formats = {3: 'H', 4: 'I', 16: 'Q'}
+    size = {}
+    for _ in range(count):
+        entry = image_file.read(entry_size)
+        tag, field_type = struct.unpack(endian + 'HH', entry[:4])
+        if tag in (256, 257) and field_type in value_formats:
+            value_format = endian + value_formats[field_type]
+            value_end = value_offset + struct.calcsize(value_format)
+            size[tag] = struct.unpack(value_format,
+                                      entry[value_offset:value_end])[0]
+    if 256 in size and 257 in size:
+        return size[256], size[257]
+    return None
+
+
+def image_size(filename):
+    # reads only the header of the image, returns None if unknown.
+    try:
+        with open(filename, 'rb') as image_file:
+            head = image_file.read(32)
+            if head[:8] == b'\x89PNG\r\n\x1a\n':
+                return png_size(head)
+            if head[:2] == b'\xff\xd8':
+                return jpeg_size(image_file)
+            if head[:2] in (b'II', b'MM'):
+                return tiff_size(image_file, head)
+    except (OSError, struct.error):
+        return None
+    return None
@@ -0,0 +1,149 @@
+import json
+import time
+from math import ceil
+
+import gi
+gi.require_version('Gdk', '3.0')
+from gi.repository import Gdk, GLib
+
+# handler methods that get the input events of the drawing area.
+methods = ('add_remove_point', 'mouse_move', 'mouse_wheel', 'handle_shortcuts')
+fields = ('button', 'x', 'y', 'state', 'delta_x', 'delta_y', 'keyval')
+
+
+def event_fields(event):
+    entry = {'type': int(event.type)}
+    for field in fields:
+        value = getattr(event, field, None)
+        if value is not None:
+            entry[field] = int(value) if field in ('state', 'keyval',
+                                                  'button') else value
+    return entry
+
+
+def percentile(values, percent):
+    # nearest rank on sorted values.
+    idx = max(ceil(percent / 100 * len(values)) - 1, 0)
+    return values[idx]
+
+
+class ReplayEvent:
+    def __init__(self, entry):
+        for field in fields:
+            setattr(self, field, entry.get(field))
+        self.type = Gdk.EventType(entry['type'])
+        self.state = Gdk.ModifierType(entry.get('state') or 0)
+
+
+class Recorder:
+    def __init__(self, handler, filename):
+        self.trace_file = open(filename, 'w', buffering=1)
+        self.start = time.perf_counter()
+        # the wrappers are set before the signals are connected.
+        for name in methods:
+            setattr(handler, name, self.wrap(name, getattr(handler, name)))
+
+    def wrap(self, name, method):
+        def recorded(widget, event):
+            self.write({'method': name, 'event': event_fields(event)})
+            return method(widget, event)
+        return recorded
+
+    def record_action(self, name):
+        self.write({'action': name})
+
+    def write(self, entry):
+        entry['time'] = time.perf_counter() - self.start
+        self.trace_file.write(json.dumps(entry) + '\n')
+
+
+class Replayer:
+    def __init__(self, app, handler, filename, timeout=1.0):
+        self.app = app
+        self.handler = handler
+        self.timeout = timeout
+        with open(filename) as trace_file:
+            entries = [json.loads(line) for line in trace_file
+                       if line.strip()]
+        # the report is printed instead of quitting at the recorded end.
+        self.entries = [entry for entry in entries
+                        if entry.get('action') != 'quit']
+        self.latencies = {}
+        self.pending = None
+        self.next_idx = 0
+
+    def start(self):
+        self.frame_clock = self.app.window.get_frame_clock()
+        self.frame_clock.connect('after-paint', self.on_after_paint)
+        self.start_time = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.schedule_next()
+
+    def schedule_next(self):
+        if self.next_idx >= len(self.entries):
+            self.report()
+            self.app.quit()
+            return
+        # the events are replayed at the pace they were recorded.
+        entry = self.entries[self.next_idx]
+        elapsed = time.perf_counter() - self.start_time
+        delay = max(entry['time'] - elapsed, 0)
+        GLib.timeout_add(int(delay * 1000), self.dispatch)
+
+    def dispatch(self):
+        entry = self.entries[self.next_idx]
+        self.next_idx = self.next_idx + 1
+        if 'action' in entry:
+            kind = entry['action']
+        else:
+            event_type = Gdk.EventType(entry['event']['type'])
+            kind = '%s:%s' % (entry['method'], event_type.value_nick)
+        start = time.perf_counter()
+        self.pending = (kind, start)
+        if 'action' in entry:
+            self.app.activate_action(entry['action'], None)
+        else:
+            method = getattr(self.handler, entry['method'])
+            method(None, ReplayEvent(entry['event']))
+        self.frame_clock.request_phase(Gdk.FrameClockPhase.PAINT)
+        GLib.timeout_add(int(self.timeout * 1000), self.on_timeout, start)
+        return False
+
+    def on_after_paint(self, frame_clock):
+        # the latency is the time until the next frame is on screen.
+        if self.pending is not None:
+            kind, start = self.pending
+            self.pending = None
+            latency = time.perf_counter() - start
+            self.latencies.setdefault(kind, []).append(latency)
+            self.schedule_next()
+
+    def on_timeout(self, start):
+        if self.pending is not None and self.pending[1] == start:
+            kind, _ = self.pending
+            self.pending = None
+            self.latencies.setdefault(kind, []).append(self.timeout)
+            self.schedule_next()
+        return False
+
+    def report(self):
+        print('%-34s %6s %8s %8s %8s %8s' % ('event', 'count', 'p50 ms',
+                                             'p90 ms', 'p99 ms', 'max ms'))
+        everything = []
+        for kind, latencies in sorted(self.latencies.items()):
+            everything.extend(latencies)
+            self.print_row(kind, latencies)
+        self.print_row('all', everything)
+        print('wall %.2f s, cpu %.2f s' % (
+            time.perf_counter() - self.start_time,
+            time.process_time() - self.start_cpu))
+
+    @staticmethod
+    def print_row(kind, latencies):
+        if not latencies:
+            return
+        latencies = sorted(latencies)
+        print('%-34s %6i %8.1f %8.1f %8.1f %8.1f' % (
+            kind, len(latencies), percentile(latencies, 50) * 1000,
+            percentile(latencies, 90) * 1000,
+            percentile(latencies, 99) * 1000, latencies[-1] * 1000))
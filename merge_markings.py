@@ -0,0 +1,164 @@
+import argparse
+import csv
+import os
+from collections import namedtuple
+from math import floor
+
+from annotations import HEADER, open_points
+from point_types import type_name
+
+merge_result = namedtuple('merge_result', ['markings', 'duplicates',
+                                           'conflicts'])
+
+
+def cl_arg():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+        description='Merge marking files from several annotators.')
+    parser.add_argument('files',
+                        type=str,
+                        nargs='+',
+                        help='Marking files in csv (%(type)s).')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        required=True,
+                        help='File to save the merged markings in '
+                             '(%(type)s).')
+    parser.add_argument('-c', '--conflicts',
+                        type=str,
+                        help='File to save conflicts in (%(type)s).')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=10,
+                        help='Distance in pixels within which markings '
+                             'are the same (%(type)s).')
+    arguments = parser.parse_args()
+    if arguments.tolerance <= 0:
+        parser.error('the tolerance must be larger than 0')
+    return arguments
+
+
+def conflicts_filename(output):
+    return os.path.splitext(output)[0] + '_conflicts.csv'
+
+
+class Merger:
+    def __init__(self, files, output, conflicts=None, tolerance=10):
+        if tolerance <= 0:
+            raise ValueError('The tolerance must be larger than 0')
+        self.files = files
+        self.output = output
+        if conflicts is None:
+            conflicts = conflicts_filename(output)
+        self.conflicts = conflicts
+        self.tolerance = tolerance
+        # image -> cell -> [x, y, x2, y2, box, type, file index, sources]
+        self.grid = {}
+        self.markings = 0
+        self.duplicates = 0
+        self.conflict_count = 0
+        self.total_bytes = sum(os.path.getsize(f) for f in files) or 1
+
+    def cell(self, x, y):
+        return floor(x / self.tolerance), floor(y / self.tolerance)
+
+    @staticmethod
+    def to_float(value):
+        if value in ('', 'None'):
+            return None
+        return float(value)
+
+    def close(self, a, b):
+        if a is None or b is None:
+            return a is None and b is None
+        return abs(a - b) <= self.tolerance
+
+    def is_near(self, entry, x, y, x2, y2, box):
+        dist = (entry[0] - x) ** 2 + (entry[1] - y) ** 2
+        if dist > self.tolerance ** 2 or entry[4] != box:
+            return False
+        return self.close(entry[2], x2) and self.close(entry[3], y2)
+
+    def find_near(self, cells, x, y, x2, y2, box, source):
+        cx, cy = self.cell(x, y)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for entry in cells.get((cx + dx, cy + dy), ()):
+                    # markings from the same file are never merged.
+                    if entry[6] == source:
+                        continue
+                    if self.is_near(entry, x, y, x2, y2, box):
+                        yield entry
+
+    def add_row(self, row, source, writer, conflict_writer):
+        row[1] = type_name(row[1])
+        image, point_type = row[0], row[1]
+        x, y, x2, y2 = (self.to_float(v) for v in row[2:6])
+        box = row[6] == 'True'
+        cells = self.grid.setdefault(image, {})
+        conflict = None
+        for entry in self.find_near(cells, x, y, x2, y2, box, source):
+            if entry[5] == point_type:
+                # a marking takes one duplicate from each file.
+                if entry[7] & (1 << source):
+                    continue
+                entry[7] = entry[7] | (1 << source)
+                self.duplicates = self.duplicates + 1
+                return
+            if conflict is None:
+                conflict = entry
+        if conflict is not None:
+            self.conflict_count = self.conflict_count + 1
+            conflict_writer.writerow([image, x, y,
+                                      conflict[5],
+                                      self.files[conflict[6]],
+                                      point_type,
+                                      self.files[source]])
+        entry = [x, y, x2, y2, box, point_type, source, 1 << source]
+        cells.setdefault(self.cell(x, y), []).append(entry)
+        writer.writerow(row)
+        self.markings = self.markings + 1
+
+    def iter_merge(self, chunk=10000):
+        with open_points(self.output, 'w') as out_file, \
+                open(self.conflicts, 'w', newline='') as conflict_file:
+            writer = csv.writer(out_file)
+            writer.writerow(HEADER)
+            conflict_writer = csv.writer(conflict_file)
+            conflict_writer.writerow(['image', 'x', 'y', 'type', 'file',
+                                      'other_type', 'other_file'])
+            done = 0
+            for source, filename in enumerate(self.files):
+                # the progress follows the file on disk, compressed or not.
+                with open(filename, 'rb') as raw_file, \
+                        open_points(raw_file, target=filename) as csv_file:
+                    reader = csv.reader(csv_file)
+                    next(reader, None)
+                    for idx, row in enumerate(reader):
+                        if row:
+                            self.add_row(row, source, writer,
+                                         conflict_writer)
+                        if idx % chunk == 0:
+                            yield (done + raw_file.tell()) / self.total_bytes
+                done = done + os.path.getsize(filename)
+        yield 1.0
+
+    def merge(self):
+        for _ in self.iter_merge():
+            pass
+        return self.result()
+
+    def result(self):
+        return merge_result(self.markings, self.duplicates,
+                            self.conflict_count)
+
+
+def main():
+    args = cl_arg()
+    merger = Merger(args.files, args.output, args.conflicts, args.tolerance)
+    result = merger.merge()
+    print('%i markings merged, %i duplicates removed, %i conflicts' % result)
+
+
+if __name__ == '__main__':
+    main()
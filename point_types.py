@@ -0,0 +1,92 @@
+import csv
+from collections import namedtuple
+
+point_type = namedtuple('point_type', ['color', 'name', 'shortcut'])
+
+
+def type_name(name):
+    # point type names are compared without the spaces around them.
+    return name.strip()
+
+
+def read_point_types(filename):
+    # the types keep the order of the file, it gives the class ids.
+    with open(filename, newline='') as csv_file:
+        reader = csv.reader(csv_file, delimiter=',')
+        next(reader, None)
+        return PointTypes(row for row in reader if len(row) >= 2)
+
+
+class PointTypes:
+    # the point types by name and by shortcut, for taxonomies of any size.
+    def __init__(self, rows=()):
+        self.types = []
+        self.by_name = {}
+        self.by_shortcut = {}
+        self.prefixes = set()
+        self.search_names = []
+        for row in rows:
+            self.add(*row[:3])
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        return iter(self.types)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def add(self, color, name, shortcut=''):
+        name = type_name(name)
+        if name in self.by_name:
+            return self.get(name)
+        # without a shortcut in the file the type gets its number.
+        shortcut = shortcut.strip() or str(len(self.types) + 1)
+        pt = point_type(color.strip(), name, shortcut)
+        self.by_name[name] = len(self.types)
+        self.types.append(pt)
+        self.by_shortcut.setdefault(shortcut, name)
+        for end in range(1, len(shortcut)):
+            self.prefixes.add(shortcut[:end])
+        self.search_names.append(name.lower())
+        return pt
+
+    def names(self):
+        return [pt.name for pt in self.types]
+
+    def classes(self):
+        return {pt.name: idx for idx, pt in enumerate(self.types)}
+
+    def index(self, name):
+        return self.by_name.get(name)
+
+    def get(self, name):
+        idx = self.by_name.get(name)
+        if idx is None:
+            return None
+        return self.types[idx]
+
+    def color(self, name, default=None):
+        pt = self.get(name)
+        if pt is None:
+            return default
+        return pt.color
+
+    def lookup(self, keys):
+        # the type of the keys and if a longer shortcut starts with them.
+        return self.by_shortcut.get(keys), keys in self.prefixes
+
+    def search(self, text):
+        # names starting with the text first, then names containing it.
+        text = text.strip().lower()
+        if not text:
+            return list(self.types)
+        starts = []
+        contains = []
+        for pt, search_name in zip(self.types, self.search_names):
+            if search_name.startswith(text):
+                starts.append(pt)
+            elif text in search_name:
+                contains.append(pt)
+        return starts + contains
@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GdkPixbuf
+
+
+def cl_arg():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+        description='Compare banded scaling with scale_simple on an image.')
+    parser.add_argument('image',
+                        type=str,
+                        help='Image to scale (%(type)s).')
+    parser.add_argument('-z', '--zoom',
+                        type=float,
+                        default=50,
+                        help='Zoom in percent (%(type)s).')
+    parser.add_argument('-j', '--threads',
+                        type=int,
+                        help='Number of threads (%(type)s).')
+    parser.add_argument('-r', '--repeats',
+                        type=int,
+                        default=3,
+                        help='Number of timed runs (%(type)s).')
+    arguments = parser.parse_args()
+    return arguments
+
+
+def band_limits(height, bands):
+    step = -(-height // bands)
+    return [(top, min(top + step, height)) for top in range(0, height, step)]
+
+
+class Resampler:
+    # scales a pixbuf in horizontal bands on a thread pool, the gil is
+    # released while gdk pixbuf scales a band.
+    def __init__(self, threads=None, min_band=64):
+        self.threads = threads or os.cpu_count() or 1
+        self.min_band = min_band
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+
+    def scale(self, buf, width, height,
+              interp=GdkPixbuf.InterpType.BILINEAR):
+        # the sizes from the zoom and the scroll bars can be floats.
+        width = max(int(round(width)), 1)
+        height = max(int(round(height)), 1)
+        # every band is written straight into the one destination buffer.
+        dest = GdkPixbuf.Pixbuf.new(buf.get_colorspace(), buf.get_has_alpha(),
+                                    buf.get_bits_per_sample(), width, height)
+        scale_x = width / buf.get_width()
+        scale_y = height / buf.get_height()
+        bands = min(self.threads, max(height // self.min_band, 1))
+        futures = [self.executor.submit(buf.scale, dest, 0, top, width,
+                                        bottom - top, 0, 0, scale_x, scale_y,
+                                        interp)
+                   for top, bottom in band_limits(height, bands)]
+        for future in futures:
+            future.result()
+        return dest
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+def pixel_rows(buf):
+    # the padding at the end of the rows is left out.
+    data = buf.read_pixel_bytes().get_data()
+    rowstride = buf.get_rowstride()
+    row_size = buf.get_width() * buf.get_n_channels() * \
+        buf.get_bits_per_sample() // 8
+    return [data[row * rowstride:row * rowstride + row_size]
+            for row in range(buf.get_height())]
+
+
+def same_pixels(buf, other):
+    if (buf.get_width(), buf.get_height(), buf.get_n_channels()) != \
+            (other.get_width(), other.get_height(), other.get_n_channels()):
+        return False
+    return pixel_rows(buf) == pixel_rows(other)
+
+
+def time_scaling(scale, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        buf = scale()
+        times.append(time.perf_counter() - start)
+    return min(times), buf
+
+
+def main():
+    args = cl_arg()
+    buf = GdkPixbuf.Pixbuf.new_from_file(args.image)
+    width = max(int(buf.get_width() * args.zoom / 100), 1)
+    height = max(int(buf.get_height() * args.zoom / 100), 1)
+    resampler = Resampler(args.threads)
+    simple_time, simple_buf = time_scaling(
+        lambda: buf.scale_simple(width, height,
+                                 GdkPixbuf.InterpType.BILINEAR),
+        args.repeats)
+    banded_time, banded_buf = time_scaling(
+        lambda: resampler.scale(buf, width, height), args.repeats)
+    resampler.shutdown()
+    same = same_pixels(simple_buf, banded_buf)
+    print('%i x %i to %i x %i, %i threads' % (
+        buf.get_width(), buf.get_height(), width, height, resampler.threads))
+    print('  scale_simple %8.1f ms' % (simple_time * 1000))
+    print('  banded       %8.1f ms' % (banded_time * 1000))
+    print('  speedup      %8.2f, identical pixels: %s' % (
+        simple_time / banded_time, same))
+    if not same:
+        sys.exit('The banded scaling differs from scale_simple.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import hashlib
+import importlib
+import os
+
+import numpy as np
+
+segmenters = {}
+
+
+def register_segmenter(name, func=None):
+    # can be used as a decorator or called directly.
+    if func is None:
+        def decorator(f):
+            segmenters[name] = f
+            return f
+        return decorator
+    segmenters[name] = func
+    return func
+
+
+def get_segmenter(name):
+    if name not in segmenters and ':' in name:
+        module_name, func_name = name.split(':')
+        module = importlib.import_module(module_name)
+        register_segmenter(name, getattr(module, func_name))
+    return segmenters[name]
+
+
+@register_segmenter('excess_green')
+def excess_green(rgb, threshold=20):
+    # 2g - r - b computed in one int16 buffer.
+    exg = np.multiply(rgb[..., 1], 2, dtype=np.int16)
+    exg -= rgb[..., 0]
+    exg -= rgb[..., 2]
+    return exg > threshold
+
+
+@register_segmenter('excess_red')
+def excess_red(rgb, threshold=20):
+    exr = np.multiply(rgb[..., 0], 2, dtype=np.int16)
+    exr -= rgb[..., 1]
+    exr -= rgb[..., 2]
+    return exr > threshold
+
+
+def pixel_array(data, width, height, rowstride, n_channels):
+    # view of the pixel bytes without copying them, the rows are rowstride
+    # apart and the last row can be shorter.
+    flat = np.frombuffer(data, dtype=np.uint8)
+    if height and len(flat) < (height - 1) * rowstride + width * n_channels:
+        raise ValueError('Pixel buffer is too small')
+    array = np.lib.stride_tricks.as_strided(
+        flat, shape=(height, width, n_channels),
+        strides=(rowstride, n_channels, 1), writeable=False)
+    return array[..., :3]
+
+
+def mask_to_rgb(mask):
+    mask = np.asarray(mask)
+    rgb = np.empty(mask.shape + (3,), dtype=np.uint8)
+    if mask.dtype == bool:
+        # written straight into the three channels.
+        np.multiply(mask.view(np.uint8)[..., None], np.uint8(255), out=rgb)
+    else:
+        rgb[...] = mask[..., None]
+    return rgb
+
+
+def segment(rgb, name='excess_green'):
+    return mask_to_rgb(get_segmenter(name)(rgb))
+
+
+def cache_filename(image, cache_dir=None):
+    if cache_dir is None:
+        cache_home = os.environ.get('XDG_CACHE_HOME',
+                                    os.path.expanduser('~/.cache'))
+        cache_dir = os.path.join(cache_home, 'ImageAnnotater', 'segmented')
+    stat = os.stat(image)
+    key = '%s:%i' % (os.path.abspath(image), stat.st_mtime)
+    name = hashlib.md5(key.encode()).hexdigest() + '.png'
+    return os.path.join(cache_dir, name)
+
+
+def mask_runs(mask):
+    # horizontal runs of foreground pixels as rows, starts and ends.
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    diff = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(diff == 1)
+    _, ends = np.nonzero(diff == -1)
+    return rows, starts, ends
+
+
+def label_runs(rows, starts, ends, width):
+    # runs touching runs in the row above (8-connectivity) are joined.
+    k = width + 2
+    start_keys = rows * k + starts
+    end_keys = rows * k + ends
+    lo = np.searchsorted(end_keys, (rows - 1) * k + starts, 'left')
+    hi = np.searchsorted(start_keys, (rows - 1) * k + ends, 'right')
+    counts = np.clip(hi - lo, 0, None)
+    below = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+    above = np.repeat(lo, counts) + offsets
+    labels = np.arange(len(rows))
+    while True:
+        low = np.minimum(labels[above], labels[below])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, above, low)
+        np.minimum.at(new_labels, below, low)
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def find_blobs(mask, min_area=1):
+    rows, starts, ends = mask_runs(mask)
+    if not len(rows):
+        return np.empty((0, 7))
+    labels = label_runs(rows, starts, ends, mask.shape[1])
+    n = labels.max() + 1
+    lengths = ends - starts
+    area = np.bincount(labels, lengths, n)
+    sum_x = np.bincount(labels, lengths * (starts + ends - 1) / 2, n)
+    sum_y = np.bincount(labels, lengths * rows, n)
+    x0 = np.full(n, mask.shape[1])
+    y0 = np.full(n, mask.shape[0])
+    x1 = np.zeros(n, dtype=int)
+    y1 = np.zeros(n, dtype=int)
+    np.minimum.at(x0, labels, starts)
+    np.minimum.at(y0, labels, rows)
+    np.maximum.at(x1, labels, ends)
+    np.maximum.at(y1, labels, rows + 1)
+    blobs = np.column_stack((sum_x / area, sum_y / area,
+                             x0, y0, x1, y1, area))
+    return blobs[area >= min_area]
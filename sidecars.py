@@ -0,0 +1,80 @@
+import csv
+import hashlib
+import os
+
+from annotations import HEADER
+from atomic_files import atomic_write
+
+SIDECAR_ENDING = '.markings.csv'
+INDEX_NAME = 'markings_index.csv'
+INDEX_HEADER = ['image', 'type', 'amount', 'size', 'color']
+
+
+def sidecar_path(image, project_dir=None):
+    if project_dir is None:
+        project_dir = os.path.dirname(image)
+    name = os.path.splitext(os.path.basename(image))[0]
+    try:
+        relative = os.path.relpath(image, project_dir)
+    except ValueError:
+        relative = os.path.abspath(image)
+    # images outside the project folder also get a hash of their path, so
+    # images with the same name in different folders are kept apart.
+    if relative != os.path.basename(image):
+        relative = relative.replace(os.sep, '/')
+        name = '%s_%s' % (name, hashlib.md5(relative.encode()).hexdigest()[:8])
+    return os.path.join(project_dir, name + SIDECAR_ENDING)
+
+
+def index_path(project_dir):
+    return os.path.join(project_dir, INDEX_NAME)
+
+
+def read_sidecar(image, project_dir=None):
+    filename = sidecar_path(image, project_dir)
+    if not os.path.isfile(filename):
+        return
+    with open(filename, newline='') as csv_file:
+        reader = csv.reader(csv_file, delimiter=',')
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield row
+
+
+def write_sidecar(image, rows, project_dir=None):
+    filename = sidecar_path(image, project_dir)
+    rows = list(rows)
+    if not rows:
+        if os.path.isfile(filename):
+            os.remove(filename)
+        return
+    with atomic_write(filename) as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def read_index(project_dir):
+    filename = index_path(project_dir)
+    if not os.path.isfile(filename):
+        return
+    with open(filename, newline='') as csv_file:
+        reader = csv.reader(csv_file, delimiter=',')
+        next(reader, None)
+        for row in reader:
+            if row:
+                image, point_type, amount, size, color = row
+                # the images are stored relative to the project folder.
+                image = os.path.normpath(os.path.join(project_dir, image))
+                yield image, point_type, int(amount), float(size), color
+
+
+def write_index(project_dir, entries):
+    with atomic_write(index_path(project_dir)) as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(INDEX_HEADER)
+        for image, point_type, amount, size, color in entries:
+            if amount:
+                image = os.path.relpath(image, project_dir)
+                writer.writerow([image, point_type, amount, size, color])
@@ -0,0 +1,152 @@
+from math import floor
+
+
+def marking_segments(marking):
+    x, y, x2, y2 = marking.x, marking.y, marking.x2, marking.y2
+    if x2 is None:
+        return [(x, y, x, y)]
+    if marking.box:
+        return [(x, y, x, y2), (x, y2, x2, y2),
+                (x2, y2, x2, y), (x2, y, x, y)]
+    return [(x, y, x2, y2)]
+
+
+def marking_bbox(marking):
+    if marking.x2 is None:
+        return marking.x, marking.y, marking.x, marking.y
+    return (min(marking.x, marking.x2), min(marking.y, marking.y2),
+            max(marking.x, marking.x2), max(marking.y, marking.y2))
+
+
+def segment_in_rect(segment, rect):
+    # Liang-Barsky clipping of the segment against the rectangle.
+    x, y, x2, y2 = segment
+    left, top, right, bottom = rect
+    dx = x2 - x
+    dy = y2 - y
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x - left), (dx, right - x),
+                 (-dy, y - top), (dy, bottom - y)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                return False
+    return True
+
+
+def orientation(ax, ay, bx, by, cx, cy):
+    value = (by - ay) * (cx - bx) - (bx - ax) * (cy - by)
+    return (value > 0) - (value < 0)
+
+
+def segments_intersect(s1, s2):
+    ax, ay, bx, by = s1
+    cx, cy, dx, dy = s2
+    o1 = orientation(ax, ay, bx, by, cx, cy)
+    o2 = orientation(ax, ay, bx, by, dx, dy)
+    o3 = orientation(cx, cy, dx, dy, ax, ay)
+    o4 = orientation(cx, cy, dx, dy, bx, by)
+    return o1 != o2 and o3 != o4
+
+
+def point_in_polygon(x, y, polygon):
+    inside = False
+    n = len(polygon)
+    for i in range(n):
+        xa, ya = polygon[i]
+        xb, yb = polygon[(i + 1) % n]
+        if (ya > y) != (yb > y):
+            if x < (xb - xa) * (y - ya) / (yb - ya) + xa:
+                inside = not inside
+    return inside
+
+
+def segment_in_polygon(segment, polygon):
+    x, y, x2, y2 = segment
+    if point_in_polygon(x, y, polygon) or point_in_polygon(x2, y2, polygon):
+        return True
+    n = len(polygon)
+    for i in range(n):
+        edge = polygon[i] + polygon[(i + 1) % n]
+        if segments_intersect(segment, edge):
+            return True
+    return False
+
+
+class SpatialIndex:
+    def __init__(self, markings=(), cell_size=256):
+        self.cell_size = cell_size
+        self.cells = {}
+        for marking in markings:
+            self.insert(marking)
+
+    def cell_range(self, bbox):
+        left, top, right, bottom = bbox
+        size = self.cell_size
+        for cx in range(floor(left / size), floor(right / size) + 1):
+            for cy in range(floor(top / size), floor(bottom / size) + 1):
+                yield cx, cy
+
+    def insert(self, marking, key=None):
+        # the key defaults to the object, a store can give its own ids.
+        if key is None:
+            key = id(marking)
+        for cell in self.cell_range(marking_bbox(marking)):
+            self.cells.setdefault(cell, {})[key] = marking
+
+    def remove(self, marking, key=None):
+        # only without a key is an equal marking removed in its place.
+        by_value = key is None
+        if by_value:
+            key = id(marking)
+        for cell in self.cell_range(marking_bbox(marking)):
+            entries = self.cells.get(cell)
+            if not entries:
+                continue
+            if entries.pop(key, None) is None and by_value:
+                for other, value in entries.items():
+                    if value == marking:
+                        del entries[other]
+                        break
+            if not entries:
+                del self.cells[cell]
+
+    def candidates(self, bbox):
+        found = {}
+        for cell in self.cell_range(bbox):
+            found.update(self.cells.get(cell, {}))
+        return found.items()
+
+    def query_rect_items(self, left, top, right, bottom):
+        rect = (min(left, right), min(top, bottom),
+                max(left, right), max(top, bottom))
+        for key, marking in self.candidates(rect):
+            if any(segment_in_rect(s, rect)
+                   for s in marking_segments(marking)):
+                yield key, marking
+
+    def query_polygon_items(self, polygon):
+        if len(polygon) < 3:
+            return
+        xs = [p[0] for p in polygon]
+        ys = [p[1] for p in polygon]
+        bbox = (min(xs), min(ys), max(xs), max(ys))
+        for key, marking in self.candidates(bbox):
+            if any(segment_in_polygon(s, polygon)
+                   for s in marking_segments(marking)):
+                yield key, marking
+
+    def query_rect(self, left, top, right, bottom):
+        for _, marking in self.query_rect_items(left, top, right, bottom):
+            yield marking
+
+    def query_polygon(self, polygon):
+        for _, marking in self.query_polygon_items(polygon):
+            yield marking
@@ -0,0 +1,25 @@
+import exporters
+
+classes = {'weed': 0}
+outside = [('weed', 500, 20, 600, 20, False),
+           ('weed', 500, 20, 100, 40, True),
+           ('weed', -50, -50, -10, -10, True)]
+inside = [('weed', 50, 50, None, None, False)]
+
+
+def test_boxes_outside_the_image_are_dropped():
+    markings = outside + inside
+    annotations = list(exporters.coco_annotations(markings, classes, 100,
+                                                  100, 20))
+    assert [a['bbox'] for a in annotations] == [[40, 40, 20, 20]]
+    lines = list(exporters.yolo_lines(markings, classes, 100, 100, 20))
+    assert lines == ['0 0.500000 0.500000 0.200000 0.200000\n']
+    xml = exporters.voc_xml('image.jpg', markings, classes, 100, 100, 20)
+    assert xml.count('<object>') == 1
+
+
+def test_same_named_images_get_different_names():
+    first = exporters.image_prefix('a/image.jpg')
+    second = exporters.image_prefix('b/image.jpg')
+    assert first != second
+    assert first.startswith('image_')
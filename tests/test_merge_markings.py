@@ -0,0 +1,27 @@
+import csv
+
+from merge_markings import Merger
+
+header = ['image', 'type', 'x', 'y', 'x2', 'y2', 'box']
+
+
+def write_markings(path, markings):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        for point_type, x in markings:
+            writer.writerow(['image.jpg', point_type, x, 10, '', '', 'False'])
+    return str(path)
+
+
+def merge(tmp_path, second):
+    files = [write_markings(tmp_path / 'first.csv', [('a', 10)]),
+             write_markings(tmp_path / 'second.csv', second)]
+    return Merger(files, str(tmp_path / 'merged.csv'), tolerance=5).merge()
+
+
+def test_conflicts_do_not_depend_on_the_row_order(tmp_path):
+    result = merge(tmp_path, [('b', 11), ('a', 12)])
+    assert (result.duplicates, result.conflicts) == (1, 1)
+    result = merge(tmp_path, [('a', 12), ('b', 11)])
+    assert (result.duplicates, result.conflicts) == (1, 1)
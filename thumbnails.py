@@ -0,0 +1,70 @@
+import hashlib
+import os
+
+import gi
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GdkPixbuf, GLib
+
+from atomic_files import atomic_write
+
+# sizes of the freedesktop thumbnail cache.
+sizes = {'normal': 128, 'large': 256}
+
+
+def cache_dir(flavor='normal'):
+    cache_home = os.environ.get('XDG_CACHE_HOME',
+                                os.path.expanduser('~/.cache'))
+    return os.path.join(cache_home, 'thumbnails', flavor)
+
+
+def thumbnail_path(uri, flavor='normal'):
+    name = hashlib.md5(uri.encode()).hexdigest() + '.png'
+    return os.path.join(cache_dir(flavor), name)
+
+
+def load_cached(uri, mtime, flavor):
+    try:
+        buf = GdkPixbuf.Pixbuf.new_from_file(thumbnail_path(uri, flavor))
+    except GLib.Error:
+        return None
+    if buf.get_option('tEXt::Thumb::URI') != uri or \
+            buf.get_option('tEXt::Thumb::MTime') != str(mtime):
+        return None
+    return buf
+
+
+def open_private(filename):
+    # the thumbnail spec wants the thumbnails readable by the owner only.
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    return os.fdopen(fd, 'wb')
+
+
+def save_cached(buf, uri, mtime, flavor):
+    path = thumbnail_path(uri, flavor)
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        _, data = buf.save_to_bufferv('png',
+                                      ['tEXt::Thumb::URI',
+                                       'tEXt::Thumb::MTime'],
+                                      [uri, str(mtime)])
+        with atomic_write(path, open_private) as png_file:
+            png_file.write(data)
+    except (OSError, GLib.Error):
+        pass
+
+
+def load_thumbnail(filename, flavor='normal'):
+    # thumbnails are decoded at reduced size and cached on disk.
+    filename = os.path.abspath(filename)
+    uri = GLib.filename_to_uri(filename, None)
+    mtime = int(os.stat(filename).st_mtime)
+    buf = load_cached(uri, mtime, flavor)
+    if buf is None:
+        size = sizes[flavor]
+        try:
+            buf = GdkPixbuf.Pixbuf.new_from_file_at_scale(filename, size,
+                                                          size, True)
+        except GLib.Error:
+            return None
+        save_cached(buf, uri, mtime, flavor)
+    return buf
@@ -0,0 +1,159 @@
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from exporters import read_markings, resolve_image
+from image_info import image_size
+from point_types import read_point_types
+
+REPORT_HEADER = ['image', 'issue', 'type', 'x', 'y', 'x2', 'y2']
+
+
+def cl_arg():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.MetavarTypeHelpFormatter,
+        description='Check saved markings against the images and types.')
+    parser.add_argument('points',
+                        type=str,
+                        help='File of saved points in csv (%(type)s).')
+    parser.add_argument('-t', '--types',
+                        type=str,
+                        help='File with point types in csv (%(type)s).')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        help='File to write the issues to in csv '
+                             '(%(type)s).')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        help='Number of processes (%(type)s).')
+    arguments = parser.parse_args()
+    return arguments
+
+
+def coordinate_array(markings):
+    # x, y, x2 and y2 of every marking, nan where there is no second point.
+    return np.array([[np.nan if v is None else v for v in m[1:5]]
+                     for m in markings], dtype=float).reshape(-1, 4)
+
+
+def outside(values, limit):
+    return ~np.isnan(values) & ((values < 0) | (values > limit))
+
+
+def check_markings(markings, size, types):
+    coords = coordinate_array(markings)
+    xs, ys, x2s, y2s = coords.T
+    checks = []
+    if size is not None:
+        width, height = size
+        checks.append(('outside image',
+                       outside(xs, width) | outside(ys, height) |
+                       outside(x2s, width) | outside(y2s, height)))
+    checks.append(('zero length', ~np.isnan(x2s) & (xs == x2s) &
+                   (ys == y2s)))
+    if types is not None:
+        known = np.array([m[0] in types for m in markings], dtype=bool)
+        checks.append(('unknown type', ~known))
+    # equal type and coordinates, the first one is not reported.
+    names = {}
+    type_ids = [names.setdefault(m[0], len(names)) for m in markings]
+    keys = np.column_stack([type_ids, np.nan_to_num(coords, nan=-1)])
+    _, first = np.unique(keys, axis=0, return_index=True)
+    duplicate = np.ones(len(markings), dtype=bool)
+    duplicate[first] = False
+    checks.append(('duplicate', duplicate))
+    for issue, found in checks:
+        for idx in np.flatnonzero(found):
+            yield int(idx), issue
+
+
+def validate_image(job):
+    image, markings, types, root = job
+    filename = resolve_image(image, root)
+    size = image_size(filename)
+    issues = []
+    if not os.path.isfile(filename):
+        issues.append([image, 'missing image', '', '', '', '', ''])
+    elif size is None:
+        issues.append([image, 'unknown image size', '', '', '', '', ''])
+    # the markings are told apart by type and coordinates, as in the gui.
+    for idx, issue in check_markings(markings, size, types):
+        point_type, *coords, _ = markings[idx]
+        coords = ['' if v is None else v for v in coords]
+        issues.append([image, issue, point_type] + coords)
+    return issues
+
+
+def position_text(issue):
+    x, y, x2, y2 = issue[3:7]
+    if x == '':
+        return ''
+    if x2 == '':
+        return '(%g, %g)' % (x, y)
+    return '(%g, %g)-(%g, %g)' % (x, y, x2, y2)
+
+
+class Validator:
+    def __init__(self, images, types=None, jobs=None, root=None,
+                 mp_context=None):
+        self.images = images
+        self.types = types
+        self.jobs = jobs
+        self.root = root
+        self.mp_context = mp_context
+        self.issues = []
+
+    def iter_validate(self):
+        types = None if self.types is None else set(self.types)
+        work = ((image, markings, types, self.root)
+                for image, markings in self.images.items())
+        total = len(self.images) or 1
+        with ProcessPoolExecutor(self.jobs, self.mp_context) as executor:
+            results = executor.map(validate_image, work, chunksize=16)
+            for idx, issues in enumerate(results):
+                self.issues.extend(issues)
+                yield (idx + 1) / total
+
+    def validate(self):
+        for _ in self.iter_validate():
+            pass
+        return self.issues
+
+    def counts(self):
+        counts = {}
+        for issue in self.issues:
+            counts[issue[1]] = counts.get(issue[1], 0) + 1
+        return counts
+
+
+def write_report(filename, issues):
+    with open(filename, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(REPORT_HEADER)
+        writer.writerows(issues)
+
+
+def main():
+    args = cl_arg()
+    types = None
+    if args.types:
+        types = read_point_types(args.types).names()
+    images = read_markings(args.points)
+    root = os.path.dirname(os.path.abspath(args.points))
+    validator = Validator(images, types, args.jobs, root)
+    issues = validator.validate()
+    if args.output:
+        write_report(args.output, issues)
+    else:
+        for issue in issues:
+            print(','.join(str(v) for v in issue[:3] + [position_text(issue)]))
+    print('%i images checked, %i issues' % (len(images), len(issues)))
+    for issue, count in sorted(validator.counts().items()):
+        print('  %-20s %i' % (issue, count))
+
+
+if __name__ == '__main__':
+    main()